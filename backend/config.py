@@ -8,4 +8,7 @@ ENV_MODE = os.getenv("ENV_MODE", "development")
 if ENV_MODE == "production":
   FRONTEND_ORIGINS = ["https://travel-planner-liart-theta.vercel.app"]
 else:
-  FRONTEND_ORIGINS = ["http://localhost:5173"]
\ No newline at end of file
+  FRONTEND_ORIGINS = ["http://localhost:5173"]
+
+# Token that admin routes (e.g. POST /api/recommendation/reload/{name}) expect in the X-Admin-Token header; unset disables them
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
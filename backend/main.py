@@ -1,4 +1,6 @@
 import os
+import time
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
@@ -7,10 +9,14 @@ from dotenv import load_dotenv
 import secrets
 from backend.config import FRONTEND_ORIGINS
 from backend.utils.response_helper import error_response
+from backend.utils.metrics import observe_request
 from backend.routers import home
 from backend.routers import schedule
 from backend.routers import auth
 from backend.routers import recommendation
+from backend.routers import metrics
+from ml_logic.inference_pool import inference_pool
+from ml_logic.stage_timing import collect_stage_timings
 
 load_dotenv()
 
@@ -19,7 +25,14 @@ if not secret_key:
     secret_key = secrets.token_hex(32)
     print(f"Generated SECRET_KEY: {secret_key}")
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Stop the inference worker processes together with the server
+    inference_pool.shutdown()
+
 app = FastAPI(
+    lifespan=lifespan,
     docs_url="/docs", # Set docs_url to /docs for compatibility with AWS Lambda proxy integration
     redoc_url="/redoc", # Set redoc_url to /redoc for compatibility with AWS Lambda proxy integration
 )  
@@ -33,6 +46,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Time every request and its internal stages: Server-Timing header + latency histograms
+@app.middleware("http")
+async def record_timings(request: Request, call_next):
+    started = time.perf_counter()
+    with collect_stage_timings() as timings:
+        response = await call_next(request)
+    total = time.perf_counter() - started
+
+    # Label by route template, so path parameters do not create new series
+    route = request.scope.get("route")
+    route_path = route.path if route is not None else "unmatched"
+    response.headers["Server-Timing"] = timings.to_server_timing(total)
+    observe_request(request.method, route_path, response.status_code, total, timings.durations)
+    return response
+
 # Session middleware
 # app.add_middleware(
 #     SessionMiddleware,
@@ -46,6 +74,7 @@ app.include_router(home.router)
 app.include_router(schedule.router)
 app.include_router(auth.router)
 app.include_router(recommendation.router)
+app.include_router(metrics.router)
 
 # Handle HTTPException
 @app.exception_handler(HTTPException)
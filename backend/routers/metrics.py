@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from backend.utils.metrics import render_metrics
+
+router = APIRouter(tags=["Metrics"])
+
+# Scraped by Prometheus; not under /api so it can be kept off the public gateway
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+  return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,8 +1,11 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel, Field
-from typing import List, Dict
-from ml_logic.services.theme_city_service import ThemeCityService
-from ml_logic.services.booking_service import BookingService, VisualService
+import hmac
+from fastapi import APIRouter, HTTPException, Header
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Dict, Optional
+from ml_logic.inference_pool import inference_pool
+from ml_logic.model_registry import model_registry
+from backend.config import ADMIN_TOKEN
 from backend.utils.response_helper import success_response, error_response
 
 router = APIRouter(
@@ -10,10 +13,6 @@ router = APIRouter(
     tags=["Recommendation"]
 )
 
-theme_city_service = ThemeCityService()
-booking_service = BookingService()
-visualization_service = VisualService()
-
 class Companion(BaseModel):
     babies: int = Field(0, ge=0)
     children: int = Field(0, ge=0)
@@ -27,6 +26,11 @@ class ThemePredictInfo(BaseModel):
     companion: Companion
     budget: str
 
+class CityBatchInfo(BaseModel):
+    profiles: List[ThemePredictInfo]
+    # Also rank the cities that suit the whole group best
+    consensus: bool = False
+
 class ClimateDetail(BaseModel):
     month: int
     temp: float
@@ -35,19 +39,61 @@ class MonthlyClimatePriceInfo(BaseModel):
     country: str
     climate_calendar: Dict[str, List[ClimateDetail]]
     
-class BookingStrategyInfo(BaseModel):
-    hotel: str
+class WeightPreset(BaseModel):
+    label: Optional[str] = None
+    w_risk: float = Field(ge=0)
+    w_price: float = Field(ge=0)
+    
+    @model_validator(mode="after")
+    def check_not_both_zero(self):
+        if self.w_risk == 0 and self.w_price == 0:
+            raise ValueError("w_risk and w_price cannot both be 0")
+        return self
+
+class WeightSlider(BaseModel):
+    # Risk share from 0 (price only) to 1 (risk only) in evenly spaced steps
+    steps: int = Field(11, ge=2, le=101)
+
+class BookingProfileInfo(BaseModel):
     arrival_date: str
     leave_date: str
     is_flexible_year: bool
     companion: Companion
     country_name: str
+    # Optional extra risk/price weights answered from the same sweep (returned as weighted_advices)
+    weight_presets: Optional[List[WeightPreset]] = Field(None, max_length=20)
+    weight_slider: Optional[WeightSlider] = None
+
+class BookingStrategyInfo(BookingProfileInfo):
+    hotel: str
+
+class BookingComparisonInfo(BookingProfileInfo):
+    include_charts: bool = True
+
+# Response: start_date / end_date of the arrival days, nights (1..STAY_GRID_MAX_NIGHTS), and adr and risk as
+# typed arrays {"dtype": "f4", "bdata": base64 of little-endian float32, "shape": "<days>, <nights>"}:
+# row i is the arrival start_date + i days, column j a stay of nights[j] nights
+class StayGridInfo(BaseModel):
+    hotel: str
+    companion: Companion
+    country_name: str
+
+class BookingStrategyBatchItem(BookingStrategyInfo):
+    include_charts: bool = True
+
+# Upper bound of profiles scored by one batch request
+BOOKING_BATCH_MAX_SIZE = 50
+CITY_BATCH_MAX_SIZE = 500
+
+def get_booking_key(user_input):
+    # Requests of one traveler profile go to the same pool worker, whose caches already hold its sweeps
+    return (user_input.country_name, *user_input.companion.model_dump().values())
   
 @router.post("/cities")
 async def get_cities(user_input: ThemePredictInfo):
     try:
         input_data = user_input.model_dump()
-        result = theme_city_service.get_complete_recommendations(input_data)
+        result = await inference_pool.run('theme_city_service', 'get_complete_recommendations', input_data)
         
         return success_response(
             "Get City Recommendation successfully!",
@@ -59,11 +105,30 @@ async def get_cities(user_input: ThemePredictInfo):
     except Exception as e:
         raise e
 
+@router.post("/cities/batch")
+async def get_cities_batch(batch: CityBatchInfo):
+    if not batch.profiles or len(batch.profiles) > CITY_BATCH_MAX_SIZE:
+        raise HTTPException(status_code=400, detail=f"Batch must contain 1 to {CITY_BATCH_MAX_SIZE} profiles")
+    
+    try:
+        input_data = [profile.model_dump() for profile in batch.profiles]
+        result = await inference_pool.run('theme_city_service', 'get_batch_recommendations', input_data, 5, batch.consensus)
+        
+        return success_response(
+            "Get City Recommendations successfully!",
+            result
+        )
+    
+    except FileNotFoundError:
+        raise HTTPException(status_code=500, detail="Missing models")
+    except Exception as e:
+        raise e
+
 @router.post("/booking")
 async def get_booking_strategy(user_input: BookingStrategyInfo):
     try:
         input_data = user_input.model_dump()
-        result = booking_service.get_hotel_booking_strategy(input_data)
+        result = await inference_pool.run('booking_service', 'get_hotel_booking_strategy', input_data, key=get_booking_key(user_input))
         
         return success_response(
             "Get Hotel Booking Strategy successfully!",
@@ -73,4 +138,118 @@ async def get_booking_strategy(user_input: BookingStrategyInfo):
     except FileNotFoundError:
         raise HTTPException(status_code=500, detail="Missing models")
     except Exception as e:
-        raise e
\ No newline at end of file
+        raise e
+
+@router.post("/booking/batch")
+async def get_booking_strategy_batch(user_inputs: List[BookingStrategyBatchItem]):
+    if not user_inputs or len(user_inputs) > BOOKING_BATCH_MAX_SIZE:
+        raise HTTPException(status_code=400, detail=f"Batch must contain 1 to {BOOKING_BATCH_MAX_SIZE} profiles")
+    
+    try:
+        input_data = [user_input.model_dump() for user_input in user_inputs]
+        result = await inference_pool.run('booking_service', 'get_hotel_booking_strategies', input_data)
+        
+        return success_response(
+            "Get Hotel Booking Strategies successfully!",
+            {"strategies": result}
+        )
+    
+    except FileNotFoundError:
+        raise HTTPException(status_code=500, detail="Missing models")
+    except Exception as e:
+        raise e
+
+@router.post("/booking/compare")
+async def get_booking_comparison(user_input: BookingComparisonInfo):
+    try:
+        input_data = user_input.model_dump()
+        result = await inference_pool.run('booking_service', 'get_hotel_comparison', input_data, key=get_booking_key(user_input))
+        
+        return success_response(
+            "Get Hotel Booking Comparison successfully!",
+            result
+        )
+    
+    except FileNotFoundError:
+        raise HTTPException(status_code=500, detail="Missing models")
+    except Exception as e:
+        raise e
+
+@router.post("/booking/stay-grid")
+async def get_booking_stay_grid(user_input: StayGridInfo):
+    try:
+        input_data = user_input.model_dump()
+        result = await inference_pool.run('booking_service', 'get_stay_grid', input_data, key=get_booking_key(user_input))
+        
+        return success_response(
+            "Get Hotel Booking Stay Grid successfully!",
+            result
+        )
+    
+    except FileNotFoundError:
+        raise HTTPException(status_code=500, detail="Missing models")
+    except Exception as e:
+        raise e
+
+# Every pool worker has its own booking service, so the stats are per worker process (keyed by pid)
+@router.get("/booking/cache")
+async def get_booking_cache_stats():
+    return success_response(
+        "Get Booking Sweep Cache stats successfully!",
+        {"workers": await inference_pool.run_on_all('booking_service', 'get_cache_stats')}
+    )
+
+@router.get("/booking/dispatcher")
+async def get_booking_dispatcher_stats():
+    return success_response(
+        "Get Booking Inference Dispatcher stats successfully!",
+        {"workers": await inference_pool.run_on_all('booking_service', 'get_dispatcher_stats')}
+    )
+
+@router.get("/pool")
+async def get_inference_pool_stats():
+    return success_response(
+        "Get Inference Pool stats successfully!",
+        inference_pool.get_stats()
+    )
+
+
+def not_ready_response(message, status):
+    return JSONResponse(
+        status_code=503,
+        content={"code": 503, "message": message, "data": status}
+    )
+
+@router.post("/warmup")
+async def warm_up_models():
+    status = await inference_pool.warm_up()
+    
+    if not status["ready"]:
+        return not_ready_response("Some models failed to load", status)
+    return success_response("Models are warmed up!", status)
+
+# Load a registry entry again in every pool worker after its artifact was published, e.g. city_data
+@router.post("/reload/{name}")
+async def reload_model(name: str, x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN or not hmac.compare_digest(x_admin_token or "", ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+    if not model_registry.is_registered(name):
+        raise HTTPException(status_code=404, detail=f"Unknown model: {name}")
+    
+    workers = await inference_pool.reload(name)
+    
+    if any(not entry["loaded"] or entry["error"] for entry in workers.values()):
+        # The workers keep serving the previous value
+        return JSONResponse(
+            status_code=500,
+            content={"code": 500, "message": f"{name} failed to reload", "data": {"workers": workers}}
+        )
+    return success_response(f"{name} reloaded!", {"workers": workers})
+
+@router.get("/ready")
+async def get_readiness():
+    status = inference_pool.get_status()
+    
+    if not status["ready"]:
+        return not_ready_response("Models are not loaded yet", status)
+    return success_response("Models are ready!", status)
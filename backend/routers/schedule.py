@@ -16,6 +16,7 @@ import time as time
 from math import radians, sin, cos, sqrt, atan2, degrees
 import itertools
 from backend.utils.response_helper import success_response, error_response
+from ml_logic.stage_timing import timed_stage
 
 class EventRequest(BaseModel):
   city: str
@@ -240,70 +241,74 @@ def recommend_schedule(req: EventRequest):
     ]
         
     # insert events
-    trip_events = fetch_events(city, start_date, end_date, trip_duration, trip_events)
+    with timed_stage("events"):
+      trip_events = fetch_events(city, start_date, end_date, trip_duration, trip_events)
     
     # insert attractions
-    ## whole city attractions
-    no_event_days_count = sum(
-      1 for day in trip_events
-      if sum(1 for item in day["data"] if item["type"] == "event") == 0
-    )
+    with timed_stage("attractions"):
+      ## whole city attractions
+      no_event_days_count = sum(
+        1 for day in trip_events
+        if sum(1 for item in day["data"] if item["type"] == "event") == 0
+      )
     
-    weekly_city_attractions = get_weekly_attractions(city, no_event_days_count)
-    exist_attractions_ids = []
-    for day in trip_events:
-      # non-events day: add two city attractions & restaurants nearby eanch attractions
-      if sum(1 for item in day["data"] if item["type"] == "event") == 0:
-        rec_attraction_pair, weekly_city_attractions = find_daily_pairs(day["weekday"], weekly_city_attractions)
-        day["data"].extend([
-          {"type": "attraction", "value": attraction}
-          for attraction in rec_attraction_pair
-        ])
-        exist_attractions_ids.extend(
-          attraction["id"] for attraction in rec_attraction_pair
-        )
+      weekly_city_attractions = get_weekly_attractions(city, no_event_days_count)
+      exist_attractions_ids = []
+      for day in trip_events:
+        # non-events day: add two city attractions & restaurants nearby eanch attractions
+        if sum(1 for item in day["data"] if item["type"] == "event") == 0:
+          rec_attraction_pair, weekly_city_attractions = find_daily_pairs(day["weekday"], weekly_city_attractions)
+          day["data"].extend([
+            {"type": "attraction", "value": attraction}
+            for attraction in rec_attraction_pair
+          ])
+          exist_attractions_ids.extend(
+            attraction["id"] for attraction in rec_attraction_pair
+          )
       
-      # the day has one event: add one nearby attraction
-      elif sum(1 for item in day["data"] if item["type"] == "event") == 1:
-        event = [item for item in day["data"] if item["type"] == "event"][0]["value"]
-        nearby_attraction = get_nearby_attraction(event["location"]["latitude"], event["location"]["longitude"], exist_attractions_ids)
-        day["data"].insert(0, {
-          "type": "attraction",
-          "value": nearby_attraction
-        })
-        exist_attractions_ids.append(nearby_attraction["id"])
+        # the day has one event: add one nearby attraction
+        elif sum(1 for item in day["data"] if item["type"] == "event") == 1:
+          event = [item for item in day["data"] if item["type"] == "event"][0]["value"]
+          nearby_attraction = get_nearby_attraction(event["location"]["latitude"], event["location"]["longitude"], exist_attractions_ids)
+          day["data"].insert(0, {
+            "type": "attraction",
+            "value": nearby_attraction
+          })
+          exist_attractions_ids.append(nearby_attraction["id"])
     
     # insesrt restaurants
-    exist_restaurant_ids = []
-    dist = 800
-    for day in trip_events:
-      insert_restaurants = []
-      weekday = day["weekday"]
-      for i, item in enumerate(day["data"]):
-        if item["type"] in ["event", "attraction"]:
-          lat = item["value"]["location"]["latitude"]
-          lng = item["value"]["location"]["longitude"]
-          meal = "lunch" if i == 0 else "dinner"
-          restaurants = get_recommend_restaurant(lat, lng, weekday, meal, exist_restaurant_ids)
-          rec_restaurant = random.choice(restaurants)
-          insert_restaurants.append((i + 1, {
-            "type": "restaurant",
-            "value": rec_restaurant
-          }))
-          exist_restaurant_ids.append(rec_restaurant["id"])
+    with timed_stage("restaurants"):
+      exist_restaurant_ids = []
+      dist = 800
+      for day in trip_events:
+        insert_restaurants = []
+        weekday = day["weekday"]
+        for i, item in enumerate(day["data"]):
+          if item["type"] in ["event", "attraction"]:
+            lat = item["value"]["location"]["latitude"]
+            lng = item["value"]["location"]["longitude"]
+            meal = "lunch" if i == 0 else "dinner"
+            restaurants = get_recommend_restaurant(lat, lng, weekday, meal, exist_restaurant_ids)
+            rec_restaurant = random.choice(restaurants)
+            insert_restaurants.append((i + 1, {
+              "type": "restaurant",
+              "value": rec_restaurant
+            }))
+            exist_restaurant_ids.append(rec_restaurant["id"])
       
-      for index, restaurant_item in reversed(insert_restaurants):
-        day["data"].insert(index, restaurant_item)
+        for index, restaurant_item in reversed(insert_restaurants):
+          day["data"].insert(index, restaurant_item)
     
     # insert residence
-    init_idx = 0
-    for idx, accommodation in choose_accommodation_partition(trip_events, trip_duration):
-      for i in range(init_idx, init_idx + idx):
-        trip_events[i]["data"].append({
-          "type": "accommodation",
-          "value": accommodation
-        })
-      init_idx += idx
+    with timed_stage("accommodation"):
+      init_idx = 0
+      for idx, accommodation in choose_accommodation_partition(trip_events, trip_duration):
+        for i in range(init_idx, init_idx + idx):
+          trip_events[i]["data"].append({
+            "type": "accommodation",
+            "value": accommodation
+          })
+        init_idx += idx
     
     trip_events = convert_to_json_safe(trip_events)
     print("Fianl trip:", trip_events)
@@ -0,0 +1,76 @@
+import bisect
+import threading
+
+# Seconds; covers sub-millisecond model stages up to slow third-party API calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _escape(value):
+  return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _format_labels(names, values, extra=None):
+  pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+  if extra:
+    pairs.append(extra)
+  return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Histogram:
+  def __init__(self, name, help_text, label_names, buckets=DEFAULT_BUCKETS):
+    self.name = name
+    self.help_text = help_text
+    self.label_names = tuple(label_names)
+    self.buckets = tuple(buckets)
+    self._series = {}  # label values -> [per-bucket counts (+Inf last), sum, count]
+    self._lock = threading.Lock()
+
+  def observe(self, label_values, value):
+    index = bisect.bisect_left(self.buckets, value)
+    with self._lock:
+      series = self._series.get(label_values)
+      if series is None:
+        series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+      series[0][index] += 1
+      series[1] += value
+      series[2] += 1
+
+  def render(self):
+    lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+    with self._lock:
+      series_items = [(labels, [list(counts), total, count]) for labels, (counts, total, count) in self._series.items()]
+
+    for label_values, (counts, total, count) in sorted(series_items):
+      cumulative = 0
+      for bound, bucket_count in zip(self.buckets, counts):
+        cumulative += bucket_count
+        bucket_labels = _format_labels(self.label_names, label_values, 'le="%s"' % bound)
+        lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+      bucket_labels = _format_labels(self.label_names, label_values, 'le="+Inf"')
+      labels = _format_labels(self.label_names, label_values)
+      lines.append(f"{self.name}_bucket{bucket_labels} {count}")
+      lines.append(f"{self.name}_sum{labels} {total}")
+      lines.append(f"{self.name}_count{labels} {count}")
+
+    return lines
+
+
+request_duration = Histogram(
+  "travel_planner_request_duration_seconds",
+  "Wall time of HTTP requests.",
+  ["method", "route", "status"]
+)
+stage_duration = Histogram(
+  "travel_planner_stage_duration_seconds",
+  "Wall time of the internal stages of a request, summed per request.",
+  ["route", "stage"]
+)
+
+def observe_request(method, route, status, seconds, stage_durations):
+  request_duration.observe((method, route, str(status)), seconds)
+  for stage, stage_seconds in stage_durations.items():
+    stage_duration.observe((route, stage), stage_seconds)
+
+def render_metrics():
+  """All metrics in the Prometheus text exposition format."""
+  lines = []
+  for histogram in (request_duration, stage_duration):
+    lines.extend(histogram.render())
+  return "\n".join(lines) + "\n"
@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 # ========================================
 # 1. Path Configurations
@@ -17,6 +18,9 @@ DATA_DIR = os.path.join(BASE_DIR, "..", "ml_research", "data")
 # ======== Hugging Face ========
 HF_BASE_URL = "https://huggingface.co/datasets/ama-h/travel-planning-logic/resolve/main"
 
+# Local cache of downloaded artifacts, shared by every worker on the machine
+ARTIFACT_CACHE_DIR = os.getenv("ARTIFACT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "travel-planner-artifacts"))
+
 # File paths
 # ========== Production ========
 if ENV_MODE == "production":
@@ -24,6 +28,7 @@ if ENV_MODE == "production":
     THEME_MODEL_PATH = f"{HF_BASE_URL}/theme_rf_model.pkl"
     THEME_PREPROCESSOR_PATH = f"{HF_BASE_URL}/theme_preprocessor.pkl"
     THEME_LE_PATH = f"{HF_BASE_URL}/theme_label_encoder.pkl"
+    THEME_TABLE_PATH = f"{HF_BASE_URL}/theme_table.npz"
 
     # --- City Model ---
     CITY_MODEL_PATH = f"{HF_BASE_URL}/city_knn_model.pkl"
@@ -43,6 +48,7 @@ else:
     THEME_MODEL_PATH = os.path.join(MODELS_DIR, "theme_predict", "theme_rf_model.pkl")
     THEME_PREPROCESSOR_PATH = os.path.join(MODELS_DIR, "theme_predict", "theme_preprocessor.pkl")
     THEME_LE_PATH = os.path.join(MODELS_DIR, "theme_predict", "theme_label_encoder.pkl")
+    THEME_TABLE_PATH = os.path.join(MODELS_DIR, "theme_predict", "theme_table.npz")
 
     # --- City Model ---
     CITY_MODEL_PATH = os.path.join(MODELS_DIR, "city_recommend", "city_knn_model.pkl")
@@ -72,6 +78,16 @@ BUDGET_MAP = {
 # Features used in city recommendation model
 CITY_FEATURES = ['culture', 'adventure', 'nature', 'beaches', 'nightlife', 'cuisine', 'wellness', 'urban', 'seclusion']
 
+# Theme table (THEME_TABLE_PATH, built by scripts/precompute_theme_table.py): cells compared with the model
+# on load; any difference disables the table
+THEME_TABLE_CHECK_SAMPLES = 200
+
+# Nearest cities of a theme's ideal vector, before the region filter and budget re-ranking
+CITY_NEIGHBORS = 100
+
+# Region partitions of the city index up to this size are searched by brute force, larger ones by a KD-tree
+CITY_INDEX_BRUTE_MAX_SIZE = int(os.getenv("CITY_INDEX_BRUTE_MAX_SIZE", 100000))
+
 # City score weight
 WEIGHT_CONFIG = {
     'Relaxation': {'wellness': 0.4, 'seclusion': 0.4, 'beaches': 0.2},
@@ -98,6 +114,58 @@ BOOKING_FEATURES = [
     'required_car_parking_spaces', 'total_of_special_requests'
 ]
 
+# Hotel categories the booking models were trained on
+HOTEL_TYPES = ['City Hotel', 'Resort Hotel']
+
+# Booking features a lead-time sweep simulates, and the ones that identify its profile
+SWEEP_FEATURES = ['lead_time', 'arrival_date_month_num', 'arrival_date_week_number']
+SWEEP_PROFILE_FEATURES = [f for f in BOOKING_FEATURES if f not in SWEEP_FEATURES]
+
+# Booking features that identify a stay grid (the stay length is simulated as well)
+STAY_GRID_PROFILE_FEATURES = [f for f in SWEEP_PROFILE_FEATURES if f not in ('stays_in_weekend_nights', 'stays_in_week_nights')]
+
+# Memory budget of the cross-request sweep cache
+SWEEP_CACHE_MAX_BYTES = int(os.getenv("SWEEP_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+
+# Lead-time sweeps of popular profiles, precomputed nightly by scripts/precompute_booking_sweeps.py
+SWEEP_STORE_PATH = os.getenv("SWEEP_STORE_PATH", os.path.join(ARTIFACT_CACHE_DIR, "booking_sweeps.bin"))
+SWEEP_STORE_MAX_LT = 730
+# Append the profile of every booking request here (JSON lines) to find the popular ones; unset disables it
+BOOKING_PROFILE_LOG_PATH = os.getenv("BOOKING_PROFILE_LOG_PATH")
+
+
+# Micro-batching of booking model calls across concurrent requests
+INFERENCE_DISPATCHER_ENABLED = os.getenv("INFERENCE_DISPATCHER_ENABLED", "true").lower() == "true"
+INFERENCE_BATCH_WINDOW_MS = float(os.getenv("INFERENCE_BATCH_WINDOW_MS", 2))
+INFERENCE_MAX_BATCH_ROWS = int(os.getenv("INFERENCE_MAX_BATCH_ROWS", 4096))
+# Longest a caller waits for its batch before giving up with a TimeoutError
+INFERENCE_DISPATCH_TIMEOUT_S = float(os.getenv("INFERENCE_DISPATCH_TIMEOUT_S", 30))
+
+# Process pool running the CPU-bound recommendation work (0 runs it on the API process threads)
+# Lambda has no /dev/shm for multiprocessing, so the pool is off there by default
+AVAILABLE_CORES = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+INFERENCE_POOL_WORKERS = int(os.getenv("INFERENCE_POOL_WORKERS", 0 if os.getenv("AWS_LAMBDA_FUNCTION_NAME") else max(1, AVAILABLE_CORES // 2)))
+# Requests a worker runs at once; above 1 the dispatcher micro-batches their model calls inside the worker.
+# Compare layouts on the target machine with scripts/benchmark_inference_pool.py
+INFERENCE_WORKER_CONCURRENCY = int(os.getenv("INFERENCE_WORKER_CONCURRENCY", 4))
+# OpenMP/BLAS threads per pool worker, so that workers x threads stays within the cores
+INFERENCE_THREADS_PER_WORKER = int(os.getenv("INFERENCE_THREADS_PER_WORKER", max(1, AVAILABLE_CORES // max(1, INFERENCE_POOL_WORKERS))))
+
+# Booking tree models: 'lightgbm', 'numpy' (flattened trees) or 'auto' (numpy up to TREE_EVALUATOR_MAX_ROWS rows)
+TREE_EVALUATOR = os.getenv("TREE_EVALUATOR", "auto")
+TREE_EVALUATOR_MAX_ROWS = int(os.getenv("TREE_EVALUATOR_MAX_ROWS", 64))
+
+# Days covered by the stay calendar: two years of arrivals plus room for the week and the stay
+CALENDAR_HORIZON_DAYS = 800
+
+# Arrival-date x stay-length grid: arrivals over the next STAY_GRID_DAYS days, stays of 1..STAY_GRID_MAX_NIGHTS nights
+STAY_GRID_DAYS = int(os.getenv("STAY_GRID_DAYS", 365))
+STAY_GRID_MAX_NIGHTS = int(os.getenv("STAY_GRID_MAX_NIGHTS", 14))
+STAY_GRID_CACHE_MAX_BYTES = int(os.getenv("STAY_GRID_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+
+# Country names that miss the alias index and were resolved by fuzzy search, kept per process
+COUNTRY_FUZZY_MEMO_SIZE = int(os.getenv("COUNTRY_FUZZY_MEMO_SIZE", 2048))
+
 # Lead time mapping
 LEAD_TIME_CONFIG = {
     'Last Minute': 14,
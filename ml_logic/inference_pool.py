@@ -0,0 +1,350 @@
+import asyncio
+import itertools
+import math
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from threadpoolctl import threadpool_limits
+from ml_logic.config import INFERENCE_POOL_WORKERS, INFERENCE_THREADS_PER_WORKER, INFERENCE_WORKER_CONCURRENCY, INFERENCE_DISPATCHER_ENABLED
+from ml_logic.model_registry import model_registry
+from ml_logic.stage_timing import collect_stage_timings, get_current_timings
+
+THREAD_ENV_VARS = ['OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS']
+
+# Task id of the message a worker sends once its registry is loaded
+READY_TASK_ID = 0
+# A routed task stays on its key's worker until that worker holds this many times its share of the tasks
+AFFINITY_LOAD_FACTOR = 1.5
+
+def _limit_model_jobs(model, threads):
+    # Models were trained with n_jobs=-1, which would fan out to every core on each predict
+    for _, estimator in getattr(model, 'steps', [(None, model)]):
+        if hasattr(estimator, 'n_jobs'):
+            estimator.n_jobs = threads
+
+def _init_worker(threads, concurrency):
+    # Native thread pools read these when the library is first loaded (during the warm-up below)
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(threads)
+
+    status = model_registry.warm_up()
+
+    # Libraries already loaded before the warm-up get capped at runtime
+    threadpool_limits(limits=threads)
+    for name, entry in status['entries'].items():
+        if entry['loaded']:
+            _configure_entry(name, entry['kind'], threads, concurrency)
+
+    return {"pid": os.getpid(), **status}
+
+def _configure_entry(name, kind, threads, concurrency):
+    if kind == 'artifact':
+        _limit_model_jobs(model_registry.get(name), threads)
+
+    # A worker running one task at a time has no concurrent callers to micro-batch
+    if name == 'booking_service':
+        model_registry.get(name).use_dispatcher = INFERENCE_DISPATCHER_ENABLED and concurrency > 1
+
+def _reload_entry(name, threads, concurrency):
+    try:
+        model_registry.reload(name)
+    except Exception:
+        pass  # Recorded in the status; the old value keeps serving
+    else:
+        entry = model_registry.get_status()['entries'][name]
+        _configure_entry(name, entry['kind'], threads, concurrency)
+    return model_registry.get_status()['entries'][name]
+
+def _worker_main(conn, threads, concurrency):
+    # Tasks run on `concurrency` threads, so the booking dispatcher can micro-batch the model calls of
+    # concurrent requests inside the worker; results go back on the pipe in completion order
+    send_lock = threading.Lock()
+
+    def send(task_id, ok, value):
+        with send_lock:
+            try:
+                conn.send((task_id, ok, value))
+            except Exception as e:
+                # Pickling fails before anything is written, so the pipe is still usable
+                conn.send((task_id, False, RuntimeError(f"Could not return the result: {type(e).__name__}: {e}")))
+
+    def run(task_id, fn, args):
+        try:
+            send(task_id, True, fn(*args))
+        except Exception as e:
+            # The traceback does not survive pickling; keep it readable in the API process logs
+            e.add_note(f"Raised in inference worker {os.getpid()}:\n{traceback.format_exc()}")
+            send(task_id, False, e)
+
+    send(READY_TASK_ID, True, _init_worker(threads, concurrency))
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='inference') as executor:
+        while True:
+            try:
+                task = conn.recv()
+            except (EOFError, OSError):
+                break
+            if task is None:
+                break
+            executor.submit(run, *task)
+
+def _call_service(service_name, method, args):
+    # Stage timings are collected where the work runs and travel back with the result
+    with collect_stage_timings() as timings:
+        service = model_registry.get(service_name)
+        result = getattr(service, method)(*args)
+    return result, timings.durations
+
+
+class _Worker:
+    """One pool process, the pipe to it and the futures of the tasks it is running."""
+    def __init__(self, context, threads, concurrency):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, threads, concurrency), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+        self.ready = Future()
+        self.broken = False
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._reader = threading.Thread(target=self._read, name=f"inference-worker-{self.process.pid}", daemon=True)
+        self._reader.start()
+
+    @property
+    def load(self):
+        return len(self._pending)
+
+    def submit(self, task_id, fn, args):
+        # Running futures cannot be cancelled, so an abandoned request never races the reader
+        future = Future()
+        future.set_running_or_notify_cancel()
+        with self._lock:
+            if self.broken:
+                raise BrokenProcessPool(f"Inference worker {self.process.pid} is gone")
+            self._pending[task_id] = future
+
+        try:
+            with self._send_lock:
+                self.conn.send((task_id, fn, args))
+        except (OSError, ValueError) as e:
+            self._fail(BrokenProcessPool(f"Inference worker {self.process.pid} is gone: {e}"))
+        return future
+
+    def _read(self):
+        try:
+            while True:
+                task_id, ok, value = self.conn.recv()
+                if task_id == READY_TASK_ID:
+                    self.ready.set_result(value)
+                    continue
+
+                with self._lock:
+                    future = self._pending.pop(task_id, None)
+                if future is None:
+                    continue
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+        except (EOFError, OSError):
+            pass
+
+        # The process died (e.g. killed for memory) or was shut down
+        self._fail(BrokenProcessPool(f"Inference worker {self.process.pid} exited with code {self.process.exitcode}"))
+
+    def _fail(self, error):
+        with self._lock:
+            self.broken = True
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.set_exception(error)
+        if not self.ready.done():
+            self.ready.set_exception(error)
+
+    def stop(self, timeout):
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.conn.close()
+
+
+class InferencePool:
+    """
+    Process pool for the CPU-bound recommendation work (model scoring and chart building).
+    Every worker loads the registry once at start-up and runs up to `concurrency` tasks at a time
+    (above 1, concurrent tasks share micro-batched model calls). Tasks with the same routing key go
+    to the same worker unless it is overloaded, so each profile's sweeps are cached in one worker.
+    Route handlers await run() so the event loop stays free for I/O-bound requests. With 0 workers
+    the work runs on threads of the API process instead.
+    """
+    def __init__(self, workers=INFERENCE_POOL_WORKERS, threads_per_worker=INFERENCE_THREADS_PER_WORKER, concurrency=INFERENCE_WORKER_CONCURRENCY):
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker
+        self.concurrency = concurrency
+        self._context = multiprocessing.get_context('spawn')
+        self._slots = [None] * workers
+        self._task_ids = itertools.count(READY_TASK_ID + 1)
+        self._lock = threading.Lock()
+
+        self.tasks = 0
+        self.failures = 0
+        self.in_flight = 0
+        self.restarts = 0
+        self.total_seconds = 0.0
+
+    @property
+    def enabled(self):
+        return self.workers > 0
+
+    def _get_worker(self, slot):
+        # spawn: forking the API process would copy its threads (dispatchers, anyio workers) in a broken state
+        with self._lock:
+            worker = self._slots[slot]
+            if worker is None or worker.broken:
+                if worker is not None:
+                    self.restarts += 1
+                    worker.process.join(0)
+                worker = self._slots[slot] = _Worker(self._context, self.threads_per_worker, self.concurrency)
+            return worker
+
+    def _pick_slot(self, key):
+        with self._lock:
+            loads = [worker.load if worker is not None else 0 for worker in self._slots]
+        if key is None:
+            return loads.index(min(loads))
+
+        # Consistent hashing with bounded loads: the key's worker, or the next one in order while it is full
+        capacity = math.ceil(AFFINITY_LOAD_FACTOR * (sum(loads) + 1) / self.workers)
+        start = hash(key) % self.workers
+        for i in range(self.workers):
+            slot = (start + i) % self.workers
+            if loads[slot] < capacity:
+                return slot
+        return start
+
+    async def _submit(self, slot, fn, *args):
+        worker = self._get_worker(slot)
+        return await asyncio.wrap_future(worker.submit(next(self._task_ids), fn, args))
+
+    async def run(self, service_name, method, *args, key=None):
+        """
+        Call `method` of the registry service `service_name` in a worker and return its result.
+        `key` routes tasks with the same key to the same worker, e.g. the profile of a cached sweep.
+        """
+        with self._lock:
+            self.in_flight += 1
+        started = time.perf_counter()
+        failed = False
+
+        try:
+            if not self.enabled:
+                result, durations = await asyncio.to_thread(_call_service, service_name, method, args)
+            else:
+                result, durations = await self._submit(self._pick_slot(key), _call_service, service_name, method, args)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self.tasks += 1
+                self.failures += failed
+                self.total_seconds += time.perf_counter() - started
+
+        timings = get_current_timings()
+        if timings is not None:
+            timings.merge(durations)
+        return result
+
+    async def run_on_all(self, service_name, method, *args):
+        """Call `method` of `service_name` once in every worker (or in the API process); returns {pid: result}."""
+        if not self.enabled:
+            result, _ = await asyncio.to_thread(_call_service, service_name, method, args)
+            return {os.getpid(): result}
+
+        pids = [self._get_worker(slot).process.pid for slot in range(self.workers)]
+        results = await asyncio.gather(*[self._submit(slot, _call_service, service_name, method, args) for slot in range(self.workers)])
+        return {pid: result for pid, (result, _) in zip(pids, results)}
+
+    async def reload(self, name):
+        """
+        Load the registry entry `name` again in every worker (or in the API process), e.g. after a new
+        artifact was published; returns {pid: entry status}. Services built on the entry pick up the new
+        value on their next request, e.g. theme_city_service rebuilds its city index for a new city model.
+        """
+        if not self.enabled:
+            try:
+                await asyncio.to_thread(model_registry.reload, name)
+            except Exception:
+                pass  # Recorded in the status; the old value keeps serving
+            return {os.getpid(): model_registry.get_status()['entries'][name]}
+
+        pids = [self._get_worker(slot).process.pid for slot in range(self.workers)]
+        results = await asyncio.gather(*[
+            self._submit(slot, _reload_entry, name, self.threads_per_worker, self.concurrency) for slot in range(self.workers)
+        ])
+        return dict(zip(pids, results))
+
+    async def warm_up(self):
+        if not self.enabled:
+            return await asyncio.to_thread(model_registry.warm_up)
+
+        # Workers load the registry as they start; wait until all of them have
+        workers = [self._get_worker(slot) for slot in range(self.workers)]
+        await asyncio.gather(*[asyncio.wrap_future(worker.ready) for worker in workers], return_exceptions=True)
+        return self.get_status()
+
+    def _get_ready_statuses(self):
+        with self._lock:
+            workers = [worker for worker in self._slots if worker is not None and not worker.broken]
+        return [
+            worker.ready.result() for worker in workers
+            if worker.ready.done() and worker.ready.exception() is None
+        ]
+
+    def get_status(self):
+        if not self.enabled:
+            return {**model_registry.get_status(), "pool": self.get_stats()}
+
+        statuses = self._get_ready_statuses()
+        return {
+            "ready": len(statuses) == self.workers and all(status["ready"] for status in statuses),
+            "entries": statuses[0]["entries"] if statuses else {},
+            "pool": self.get_stats()
+        }
+
+    def get_stats(self):
+        statuses = self._get_ready_statuses()
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "threads_per_worker": self.threads_per_worker,
+                "concurrency_per_worker": self.concurrency,
+                "started_workers": sum(worker is not None and not worker.broken for worker in self._slots),
+                "ready_workers": sum(status["ready"] for status in statuses),
+                "tasks": self.tasks,
+                "failures": self.failures,
+                "in_flight": self.in_flight,
+                "restarts": self.restarts,
+                "avg_task_ms": self.total_seconds / self.tasks * 1000 if self.tasks else 0.0
+            }
+
+    def shutdown(self, timeout=5):
+        with self._lock:
+            workers, self._slots = self._slots, [None] * self.workers
+        for worker in workers:
+            if worker is not None:
+                worker.stop(timeout)
+
+
+inference_pool = InferencePool()
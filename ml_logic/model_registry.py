@@ -0,0 +1,147 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from ml_logic.config import (
+    THEME_MODEL_PATH, THEME_PREPROCESSOR_PATH, THEME_LE_PATH, THEME_TABLE_PATH,
+    CITY_MODEL_PATH, CITY_SCALER_PATH, CITY_DATA_PATH,
+    CANCELLATION_RISK_MODEL_PATH, PRICE_MODEL_PATH, COUNTRY_MONTHLY_STATS_PATH
+)
+from ml_logic.processors.artifact_cache import load_joblib_artifact, read_csv_artifact
+
+class ModelRegistry:
+    """
+    Process-wide registry of models, datasets and the services built on them.
+    Every entry is loaded once on first use; warm_up() loads them all in parallel.
+    """
+    def __init__(self):
+        self._loaders = {}
+        self._kinds = {}
+        self._values = {}
+        self._timings = {}
+        self._errors = {}
+        self._locks = {}
+        self._registry_lock = threading.Lock()
+
+    def register(self, name, loader, kind='artifact'):
+        with self._registry_lock:
+            self._loaders[name] = loader
+            self._kinds[name] = kind
+            self._locks[name] = threading.Lock()
+
+    def is_registered(self, name):
+        return name in self._loaders
+
+    def is_loaded(self, name):
+        return name in self._values
+
+    def _load(self, name):
+        # Called with the entry's lock held
+        started = time.perf_counter()
+        try:
+            value = self._loaders[name]()
+        except Exception as e:
+            self._errors[name] = f"{type(e).__name__}: {e}"
+            raise
+
+        self._timings[name] = time.perf_counter() - started
+        self._errors.pop(name, None)
+        self._values[name] = value
+        return value
+
+    def get(self, name):
+        if name in self._values:
+            return self._values[name]
+
+        with self._locks[name]:
+            # Another thread may have finished loading while we waited
+            if name in self._values:
+                return self._values[name]
+            return self._load(name)
+
+    def reload(self, name):
+        """
+        Load `name` again, e.g. after its artifact changed; services built on it check for the new value.
+        Callers keep getting the old value until the new one is loaded, and keep it if loading fails.
+        """
+        with self._locks[name]:
+            return self._load(name)
+
+    def warm_up(self):
+        # Artifacts are independent downloads/unpickles, so fetch them side by side first
+        for kind in ('artifact', 'service'):
+            names = [name for name, k in self._kinds.items() if k == kind and name not in self._values]
+            if not names:
+                continue
+
+            with ThreadPoolExecutor(max_workers=len(names)) as executor:
+                futures = [executor.submit(self.get, name) for name in names]
+                for future in futures:
+                    try:
+                        future.result()
+                    except Exception:
+                        pass  # Recorded in the status
+
+        return self.get_status()
+
+    def get_status(self):
+        entries = {
+            name: {
+                "kind": self._kinds[name],
+                "loaded": name in self._values,
+                "seconds": self._timings.get(name),
+                "error": self._errors.get(name)
+            }
+            for name in self._loaders
+        }
+        return {
+            "ready": all(entry["loaded"] for entry in entries.values()),
+            "entries": entries
+        }
+
+
+def _build_theme_city_service():
+    from ml_logic.services.theme_city_service import ThemeCityService
+    return ThemeCityService()
+
+def _build_booking_service():
+    from ml_logic.services.booking_service import BookingService
+    return BookingService()
+
+def _build_country_index():
+    from ml_logic.processors.geo_tools import get_country_index
+    return get_country_index()
+
+def _load_theme_table():
+    from ml_logic.processors.theme_table import load_theme_table
+    return load_theme_table(THEME_TABLE_PATH)
+
+def _build_visual_service():
+    from ml_logic.services.booking_service import VisualService
+    return VisualService()
+
+
+model_registry = ModelRegistry()
+
+# --- Theme Model ---
+model_registry.register('theme_rf_model', lambda: load_joblib_artifact(THEME_MODEL_PATH))
+model_registry.register('theme_preprocessor', lambda: load_joblib_artifact(THEME_PREPROCESSOR_PATH))
+model_registry.register('theme_label_encoder', lambda: load_joblib_artifact(THEME_LE_PATH))
+model_registry.register('theme_table', _load_theme_table)
+
+# --- City Model ---
+model_registry.register('city_knn_model', lambda: load_joblib_artifact(CITY_MODEL_PATH))
+model_registry.register('city_scaler', lambda: load_joblib_artifact(CITY_SCALER_PATH))
+model_registry.register('city_data', lambda: read_csv_artifact(CITY_DATA_PATH))
+
+# --- Cancellation Risk Model ---
+model_registry.register('cancel_pipeline', lambda: load_joblib_artifact(CANCELLATION_RISK_MODEL_PATH))
+model_registry.register('price_pipeline', lambda: load_joblib_artifact(PRICE_MODEL_PATH))
+model_registry.register('country_monthly_stats', lambda: read_csv_artifact(COUNTRY_MONTHLY_STATS_PATH))
+
+# --- Country names ---
+model_registry.register('country_index', _build_country_index)
+
+# --- Services ---
+model_registry.register('theme_city_service', _build_theme_city_service, kind='service')
+model_registry.register('visual_service', _build_visual_service, kind='service')
+model_registry.register('booking_service', _build_booking_service, kind='service')
@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import joblib
+import pandas as pd
+import requests
+from ml_logic.config import ARTIFACT_CACHE_DIR
+
+CHUNK_SIZE = 1024 * 1024
+SHA256_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+def is_remote(path):
+    return path.startswith('http://') or path.startswith('https://')
+
+def _hash_text(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def _get_remote_etag(url):
+    # Hugging Face puts the LFS sha256 in X-Linked-Etag on the redirect response
+    resp = requests.head(url, allow_redirects=False, timeout=10)
+    if resp.is_redirect:
+        etag = resp.headers.get('X-Linked-Etag') or resp.headers.get('ETag')
+    else:
+        resp.raise_for_status()
+        etag = resp.headers.get('ETag')
+
+    if not etag:
+        return None
+    return etag.removeprefix('W/').strip('"')
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_json_atomic(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+def _file_sha256(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _is_valid(file_path, meta):
+    # A hit must still match the recorded size and sha256, so a truncated, padded or bit-flipped copy
+    # is downloaded again; the artifacts are a few MB, so hashing them on load takes milliseconds
+    if meta is None or not os.path.exists(file_path) or os.path.getsize(file_path) != meta['size']:
+        return False
+    return _file_sha256(file_path) == meta['sha256']
+
+def _download(url, file_path, etag):
+    # Stream to a temp file next to the target, verify, then rename into place atomically
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(file_path), suffix='.part')
+    digest = hashlib.sha256()
+    size = 0
+
+    try:
+        with os.fdopen(fd, 'wb') as f, requests.get(url, stream=True, timeout=60) as resp:
+            resp.raise_for_status()
+            expected_size = resp.headers.get('Content-Length')
+
+            for chunk in resp.iter_content(chunk_size=CHUNK_SIZE):
+                f.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+
+        sha256 = digest.hexdigest()
+        if expected_size is not None and resp.headers.get('Content-Encoding') is None and int(expected_size) != size:
+            raise IOError(f"Incomplete download of {url}: {size} of {expected_size} bytes")
+        if etag and SHA256_PATTERN.match(etag) and etag != sha256:
+            raise IOError(f"Checksum mismatch for {url}")
+
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return {'url': url, 'etag': etag, 'sha256': sha256, 'size': size}
+
+def fetch_artifact(url, cache_dir=ARTIFACT_CACHE_DIR):
+    """
+    Return a local path for `url`, downloading it into the content-addressed cache if needed.
+    Entries are keyed by URL + ETag, so a new upload on the hub gets a new file.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    suffix = os.path.splitext(url.split('?')[0])[1]
+    pointer_path = os.path.join(cache_dir, f"{_hash_text(url)}.latest.json")
+
+    try:
+        etag = _get_remote_etag(url)
+    except requests.RequestException as e:
+        # Offline: reuse the last verified copy of this URL if there is one
+        pointer = _read_meta(pointer_path)
+        if pointer and _is_valid(pointer['file'], _read_meta(pointer['file'] + '.json')):
+            print(f"⚠️ Could not reach {url} ({e}), using cached copy")
+            return pointer['file']
+        raise
+
+    key = _hash_text(f"{url}\n{etag or ''}")
+    file_path = os.path.join(cache_dir, f"{key}{suffix}")
+    meta_path = file_path + '.json'
+
+    # Without an ETag there is nothing to revalidate against, so always refresh
+    if etag is None or not _is_valid(file_path, _read_meta(meta_path)):
+        meta = _download(url, file_path, etag)
+        _write_json_atomic(meta_path, meta)
+
+    _write_json_atomic(pointer_path, {'url': url, 'file': file_path})
+    return file_path
+
+def load_joblib_artifact(path):
+    local_path = fetch_artifact(path) if is_remote(path) else path
+    return joblib.load(local_path, mmap_mode='r')
+
+def read_csv_artifact(path, **kwargs):
+    local_path = fetch_artifact(path) if is_remote(path) else path
+    return pd.read_csv(local_path, **kwargs)
@@ -0,0 +1,87 @@
+import numpy as np
+from sklearn.neighbors import KDTree
+
+def to_unit_vectors(vectors):
+    # Like sklearn's cosine distance: zero vectors stay zero and end up at distance 1 from everything
+    vectors = np.asarray(vectors, dtype=np.float64)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+def _top_k(distances, rows, k):
+    # k smallest distances, ties broken by row (i.e. dataset order)
+    if k < len(distances):
+        keep = np.argpartition(distances, k - 1)[:k]
+        cutoff = distances[keep].max()
+        keep = np.flatnonzero(distances <= cutoff)
+        distances, rows = distances[keep], rows[keep]
+
+    order = np.lexsort((rows, distances))[:k]
+    return distances[order], rows[order]
+
+class CityIndex:
+    """
+    Cosine nearest-neighbor search over one set of cities (rows of the scaled city features).
+    Small sets are searched by brute force; larger ones by a KD-tree over the unit vectors,
+    where Euclidean distance d gives the cosine distance d^2 / 2.
+    """
+    def __init__(self, features, rows, brute_max_size=100000):
+        self.rows = np.asarray(rows, dtype=np.int64)
+        unit = to_unit_vectors(features)
+        nonzero = np.linalg.norm(unit, axis=1) > 0
+
+        if len(self.rows) <= brute_max_size:
+            self.tree = None
+            self.unit = unit
+        else:
+            self.tree = KDTree(unit[nonzero])
+            self.tree_rows = self.rows[nonzero]
+            self.zero_rows = self.rows[~nonzero]
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def kind(self):
+        return 'brute' if self.tree is None else 'tree'
+
+    def search(self, query, k):
+        """(cosine distances, city rows) of the k nearest cities, nearest first."""
+        query = to_unit_vectors(query)
+        k = min(k, len(self.rows))
+
+        if self.tree is None:
+            distances = np.clip(1 - self.unit @ query, 0, 2)
+            return _top_k(distances, self.rows, k)
+
+        if not np.any(query):
+            # Cosine distance to a zero vector is 1 for every city
+            return np.ones(k), np.sort(self.rows)[:k]
+
+        tree_k = min(k, len(self.tree_rows))
+        euclidean, positions = self.tree.query(query[None, :], k=tree_k)
+        distances = np.clip(euclidean[0] ** 2 / 2, 0, 2)
+        rows = self.tree_rows[positions[0]]
+
+        if len(self.zero_rows):
+            distances = np.concatenate([distances, np.ones(len(self.zero_rows))])
+            rows = np.concatenate([rows, self.zero_rows])
+        return _top_k(distances, rows, k)
+
+
+class RegionCityIndex:
+    """One CityIndex per region, so a search returns the nearest cities inside the requested region."""
+    def __init__(self, features, regions, brute_max_size=100000):
+        regions = np.asarray(regions, dtype=object)
+        self.partitions = {
+            region: CityIndex(features[rows], rows, brute_max_size)
+            for region, rows in ((region, np.flatnonzero(regions == region)) for region in dict.fromkeys(regions))
+        }
+
+    def __contains__(self, region):
+        return region in self.partitions
+
+    def search(self, query, k, region):
+        return self.partitions[region].search(query, k)
+
+    def get_stats(self):
+        return {region: {"cities": len(index), "kind": index.kind} for region, index in self.partitions.items()}
@@ -0,0 +1,164 @@
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, FunctionTransformer
+
+class CompiledFeatureEncoder:
+    """
+    Plain lookup-table version of a fitted ColumnTransformer.
+    Supports the OneHotEncoder / OrdinalEncoder / passthrough layout used by the booking pipelines.
+    """
+    def __init__(self, column_transformer, feature_names):
+        self.feature_names = list(feature_names)
+        self.n_output = sum(s.stop - s.start for s in column_transformer.output_indices_.values())
+        self.onehot_columns = {}    # feature -> (output offset, {category: position})
+        self.ordinal_columns = {}   # feature -> (output index, {category: code}, unknown code)
+        self.numeric_columns = {}   # feature -> output index
+
+        for name, transformer, columns in column_transformer.transformers_:
+            output_slice = column_transformer.output_indices_[name]
+            columns = self._resolve_columns(column_transformer, columns)
+
+            if transformer == 'drop' or output_slice.start == output_slice.stop:
+                continue
+            elif transformer == 'passthrough' or self._is_identity(transformer):
+                for i, col in enumerate(columns):
+                    self.numeric_columns[col] = output_slice.start + i
+            elif isinstance(transformer, OneHotEncoder):
+                if transformer.drop_idx_ is not None or getattr(transformer, '_infrequent_enabled', False):
+                    raise ValueError(f"Unsupported OneHotEncoder options in '{name}'")
+                if transformer.handle_unknown == 'error':
+                    raise ValueError(f"OneHotEncoder '{name}' must ignore unknown categories")
+
+                offset = output_slice.start
+                for col, categories in zip(columns, transformer.categories_):
+                    self.onehot_columns[col] = (offset, {c: i for i, c in enumerate(categories.tolist())})
+                    offset += len(categories)
+            elif isinstance(transformer, OrdinalEncoder):
+                if transformer.handle_unknown != 'use_encoded_value':
+                    raise ValueError(f"OrdinalEncoder '{name}' must encode unknown categories")
+
+                for i, (col, categories) in enumerate(zip(columns, transformer.categories_)):
+                    lookup = {c: float(code) for code, c in enumerate(categories.tolist())}
+                    self.ordinal_columns[col] = (output_slice.start + i, lookup, float(transformer.unknown_value))
+            else:
+                raise ValueError(f"Unsupported transformer '{name}': {type(transformer).__name__}")
+
+        missing = set(self.feature_names) - set(self.onehot_columns) - set(self.ordinal_columns) - set(self.numeric_columns)
+        if missing:
+            raise ValueError(f"Features not produced by the transformer: {sorted(missing)}")
+
+    @staticmethod
+    def _resolve_columns(column_transformer, columns):
+        if isinstance(columns, slice) or np.asarray(columns).dtype.kind in 'iub':
+            return list(np.asarray(column_transformer.feature_names_in_)[columns])
+        return list(columns)
+
+    @staticmethod
+    def _is_identity(transformer):
+        return isinstance(transformer, FunctionTransformer) and transformer.func is None
+
+    @classmethod
+    def from_pipeline(cls, pipeline, feature_names):
+        """Return (encoder, final estimator) of a [ColumnTransformer, estimator] pipeline."""
+        if not isinstance(pipeline, Pipeline) or len(pipeline.steps) != 2:
+            raise ValueError("Expected a two-step preprocessor/estimator pipeline")
+
+        column_transformer = pipeline.steps[0][1]
+        if not isinstance(column_transformer, ColumnTransformer):
+            raise ValueError("The first pipeline step is not a ColumnTransformer")
+
+        return cls(column_transformer, feature_names), pipeline.steps[-1][1]
+
+    def _lookup(self, lookup, values, unknown):
+        if np.ndim(values) == 0:
+            return lookup.get(values, unknown)
+
+        # Look up each distinct category once, then broadcast back to the rows
+        inverse, uniques = pd.factorize(np.asarray(values, dtype=object), use_na_sentinel=False)
+        codes = np.array([lookup.get(u, unknown) for u in uniques.tolist()], dtype=float)
+        return codes[inverse]
+
+    def transform(self, columns, n_rows=1):
+        """
+        Encode feature columns into the model matrix.
+        `columns` maps every feature name to a scalar (broadcast to all rows) or a 1-D array of length n_rows.
+        """
+        X = np.zeros((n_rows, self.n_output), dtype=np.float64)
+
+        for col, idx in self.numeric_columns.items():
+            X[:, idx] = columns[col]
+
+        for col, (idx, lookup, unknown) in self.ordinal_columns.items():
+            X[:, idx] = self._lookup(lookup, columns[col], unknown)
+
+        for col, (offset, lookup) in self.onehot_columns.items():
+            positions = self._lookup(lookup, columns[col], -1)
+            if np.ndim(positions) == 0:
+                if positions >= 0:
+                    X[:, offset + int(positions)] = 1.0
+            else:
+                rows = np.flatnonzero(positions >= 0)
+                X[rows, offset + positions[rows].astype(np.int64)] = 1.0
+
+        return X
+
+    def get_category_space(self):
+        """All categories known to the encoder, per categorical feature."""
+        space = {col: list(lookup) for col, (_, lookup) in self.onehot_columns.items()}
+        space.update({col: list(lookup) for col, (_, lookup, _) in self.ordinal_columns.items()})
+        return space
+
+
+def build_category_grid(encoder, numeric_rows=1, seed=42):
+    """
+    Every combination of the encoder's categories (plus an unseen and a missing value per feature),
+    each repeated with `numeric_rows` random draws of the numeric features.
+    """
+    rng = np.random.default_rng(seed)
+    space = encoder.get_category_space()
+    axes = [np.array(categories + ['__unseen__', None], dtype=object) for categories in space.values()]
+    positions = [position.ravel() for position in np.meshgrid(*[np.arange(len(axis)) for axis in axes], indexing='ij')]
+
+    frame = pd.DataFrame({col: np.repeat(axis[position], numeric_rows) for col, axis, position in zip(space, axes, positions)})
+    for col in encoder.numeric_columns:
+        frame[col] = rng.integers(0, 60, len(frame))
+    return frame[encoder.feature_names]
+
+def find_encoder_mismatches(pipeline, encoder, estimator, predict_method, frame):
+    """Rows of `frame` whose compiled matrix or prediction differs from the full sklearn pipeline."""
+    columns = {col: frame[col].to_numpy() for col in encoder.feature_names}
+    compiled_X = encoder.transform(columns, len(frame))
+    pipeline_X = pipeline.steps[0][1].transform(frame)
+    if hasattr(pipeline_X, 'toarray'):
+        pipeline_X = pipeline_X.toarray()
+    differs = (compiled_X != np.asarray(pipeline_X, dtype=np.float64)).any(axis=1)
+
+    compiled_pred = getattr(estimator, predict_method)(compiled_X)
+    pipeline_pred = getattr(pipeline, predict_method)(frame)
+    differs |= (compiled_pred != pipeline_pred).reshape(len(frame), -1).any(axis=1)
+    return np.flatnonzero(differs)
+
+def check_encoder_parity(pipeline, encoder, estimator, predict_method, seed=42):
+    """
+    Quick start-up comparison of the compiled path with the full sklearn pipeline: every known
+    category (plus an unseen and a missing one) of one feature at a time. The full category cross
+    product is checked offline by scripts/check_encoder_parity.py.
+    """
+    rng = np.random.default_rng(seed)
+    space = encoder.get_category_space()
+    blocks = []
+
+    for col, categories in space.items():
+        values = categories + ['__unseen__', None]
+        block = {c: [space[c][0]] * len(values) for c in space}
+        block[col] = values
+        blocks.append(pd.DataFrame(block))
+
+    frame = pd.concat(blocks, ignore_index=True)
+    for col in encoder.numeric_columns:
+        frame[col] = rng.integers(0, 60, len(frame))
+    frame = frame[encoder.feature_names]
+
+    return len(find_encoder_mismatches(pipeline, encoder, estimator, predict_method, frame)) == 0
@@ -1,5 +1,11 @@
 import json
+import threading
+import time
+import unicodedata
+from functools import lru_cache
+import numpy as np
 import pycountry
+from ml_logic.config import COUNTRY_FUZZY_MEMO_SIZE
 
 def get_monthly_temp(temp_json, month):
     try:
@@ -27,21 +33,130 @@ def get_city_climate_calendar(city_row, climate_modes):
     
     return calendar
 
-def get_country_iso_code(country_name):
-    # Some commeon discrepancies in country names
-    mapping = {
-        'USA': 'USA',
-        'UK': 'GBR',
-        'South Korea': 'KOR',
-        'Vietnam': 'VNM'
-    }
-    if country_name in mapping:
-        return mapping[country_name]
-    try:
-        return pycountry.countries.lookup(country_name).alpha_3
-    except (LookupError, AttributeError):
+def parse_monthly_temps(temp_jsons):
+    """Cities x 12 float32 matrix of monthly average temperatures, NaN where a month is missing."""
+    temps = np.full((len(temp_jsons), 12), np.nan, dtype=np.float32)
+    
+    for i, temp_json in enumerate(temp_jsons):
+        try:
+            data = json.loads(temp_json)
+        except (TypeError, ValueError):
+            continue
+        
+        for m in range(1, 13):
+            try:
+                temp = data.get(str(m), {}).get('avg', None)
+                if temp is not None:
+                    temps[i, m - 1] = temp
+            except (AttributeError, TypeError, ValueError):
+                continue
+    
+    return temps
+
+def get_climate_codes(temps, modes):
+    """Index of the first climate mode of each temperature (like get_climate_label), -1 for NaN or no mode."""
+    codes = np.full(temps.shape, -1, dtype=np.int8)
+    
+    # Fill the modes in reverse so the first matching one wins
+    for code, (low, high) in reversed(list(enumerate(modes.values()))):
+        codes[(temps >= low) & (temps < high)] = code
+    
+    return codes
+
+def build_climate_calendar(temps, codes, labels):
+    # temps and codes are the 12 months of one city; float32 values go out with their shortest repr
+    calendar = {label: [] for label in labels}
+    
+    for code, label in enumerate(labels):
+        for m in np.flatnonzero(codes == code):
+            calendar[label].append({'month': int(m) + 1, 'temp': float(str(temps[m]))})
+    
+    return calendar
+
+# Some commeon discrepancies in country names
+COUNTRY_NAME_OVERRIDES = {
+    'USA': 'USA',
+    'UK': 'GBR',
+    'South Korea': 'KOR',
+    'Vietnam': 'VNM'
+}
+
+def normalize_country_name(name):
+    # Same folding as pycountry's fuzzy search: no accents, lower case, single spaces
+    name = unicodedata.normalize('NFKD', name)
+    name = ''.join(c for c in name if not unicodedata.combining(c))
+    return ' '.join(name.casefold().split())
+
+class CountryIndex:
+    """
+    Normalized alias -> ISO alpha-3 index of every pycountry country (codes, names, official and
+    common names) plus COUNTRY_NAME_OVERRIDES. Names it does not know go through pycountry's slow
+    fuzzy search once, then come from a bounded memo.
+    """
+    def __init__(self, aliases, fuzzy_memo_size=COUNTRY_FUZZY_MEMO_SIZE):
+        self.aliases = aliases
+        self._search_fuzzy = lru_cache(maxsize=fuzzy_memo_size)(self._search_fuzzy_uncached)
+
+    @classmethod
+    def build(cls, fuzzy_memo_size=COUNTRY_FUZZY_MEMO_SIZE):
+        started = time.perf_counter()
+        aliases = {normalize_country_name(name): code for name, code in COUNTRY_NAME_OVERRIDES.items()}
+        
+        # Countries in pycountry order, so a clash resolves like pycountry.countries.lookup
+        for country in pycountry.countries:
+            for field in ('alpha_2', 'alpha_3', 'numeric', 'name', 'official_name', 'common_name'):
+                value = getattr(country, field, None)
+                if value:
+                    aliases.setdefault(normalize_country_name(value), country.alpha_3)
+        
+        index = cls(aliases, fuzzy_memo_size)
+        print(f"✅ Country name index: {len(aliases)} aliases built in {(time.perf_counter() - started) * 1000:.1f} ms")
+        return index
+
+    @staticmethod
+    def _search_fuzzy_uncached(country_name):
         try:
-            result = pycountry.countries.search_fuzzy(country_name)
-            return result[0].alpha_3
-        except:
-            return None
\ No newline at end of file
+            return pycountry.countries.search_fuzzy(country_name)[0].alpha_3
+        except LookupError:
+            return None
+
+    def resolve(self, country_name):
+        if not isinstance(country_name, str):
+            return None
+        
+        code = self.aliases.get(normalize_country_name(country_name))
+        if code is not None:
+            return code
+        return self._search_fuzzy(country_name)
+
+    def resolve_many(self, country_names):
+        # Each distinct name is resolved once
+        codes = {name: self.resolve(name) for name in set(country_names)}
+        return [codes[name] for name in country_names]
+
+    def get_stats(self):
+        memo = self._search_fuzzy.cache_info()
+        return {
+            "aliases": len(self.aliases),
+            "fuzzy_hits": memo.hits,
+            "fuzzy_misses": memo.misses,
+            "fuzzy_memo_size": memo.currsize
+        }
+
+
+_country_index = None
+_country_index_lock = threading.Lock()
+
+def get_country_index():
+    global _country_index
+    if _country_index is None:
+        with _country_index_lock:
+            if _country_index is None:
+                _country_index = CountryIndex.build()
+    return _country_index
+
+def get_country_iso_code(country_name):
+    return get_country_index().resolve(country_name)
+
+def get_country_iso_codes(country_names):
+    return get_country_index().resolve_many(country_names)
@@ -0,0 +1,156 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+import numpy as np
+import pandas as pd
+
+class InferenceDispatcher:
+    """
+    Micro-batching front for a model predict function.
+    Callers from concurrent requests submit their rows and block (for up to `timeout_s`); a worker
+    thread gathers pending rows for up to `window_ms` (or `max_batch_rows`), predicts them as one
+    matrix and scatters the results back to each caller.
+    """
+    def __init__(self, predict_fn, window_ms=2.0, max_batch_rows=4096, name='model', timeout_s=30.0):
+        self.predict_fn = predict_fn
+        self.window = window_ms / 1000
+        self.max_batch_rows = max_batch_rows
+        self.timeout = timeout_s
+        self.name = name
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+
+        self.batches = 0
+        self.failed_batches = 0
+        self.timeouts = 0
+        self.requests = 0
+        self.rows = 0
+        self.max_batch_seen = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _ensure_worker(self):
+        with self._lock:
+            # Threads do not survive a fork, so every process starts its own worker and queue
+            if self._worker_pid != os.getpid():
+                self._queue = queue.Queue()
+                self._worker = None
+                self._worker_pid = os.getpid()
+
+            # A worker that died is replaced on the same queue, so rows already submitted still get an answer
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name=f"{self.name}-dispatcher", daemon=True)
+                self._worker.start()
+
+    def submit(self, X):
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((X, future, time.perf_counter()))
+
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            # Rows not gathered yet are dropped from the queue; a running batch just discards their result
+            future.cancel()
+            with self._lock:
+                self.timeouts += 1
+            raise TimeoutError(f"{self.name} dispatcher did not answer within {self.timeout}s") from None
+
+    def _get(self, deadline=None):
+        # Skip the rows of callers that timed out; the futures taken here can no longer be cancelled
+        while True:
+            if deadline is None:
+                item = self._queue.get()
+            else:
+                remaining = deadline - time.perf_counter()
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+
+            if item[1].set_running_or_notify_cancel():
+                return item
+
+    def _gather(self):
+        batch = [self._get()]
+        n_rows = len(batch[0][0])
+        deadline = time.perf_counter() + self.window
+
+        while n_rows < self.max_batch_rows:
+            try:
+                item = self._get(deadline)
+            except queue.Empty:
+                break
+
+            batch.append(item)
+            n_rows += len(item[0])
+
+        return batch, n_rows
+
+    def _predict(self, matrices):
+        if isinstance(matrices[0], pd.DataFrame):
+            stacked = pd.concat(matrices, ignore_index=True)
+        else:
+            stacked = np.concatenate(matrices)
+        return self.predict_fn(stacked)
+
+    def _predict_each(self, batch, error):
+        # One caller's rows can fail the whole matrix; retry every caller alone so only the bad rows fail
+        if len(batch) == 1:
+            batch[0][1].set_exception(error)
+            return
+
+        for X, future, _ in batch:
+            try:
+                future.set_result(self.predict_fn(X))
+            except Exception as e:
+                future.set_exception(e)
+
+    def _run(self):
+        while True:
+            batch, n_rows = self._gather()
+            started = time.perf_counter()
+
+            try:
+                predictions = self._predict([X for X, _, _ in batch])
+            except Exception as e:
+                with self._lock:
+                    self.failed_batches += 1
+                self._predict_each(batch, e)
+                continue
+
+            self._record(batch, n_rows, started)
+
+            offset = 0
+            for X, future, _ in batch:
+                future.set_result(predictions[offset:offset + len(X)])
+                offset += len(X)
+
+    def _record(self, batch, n_rows, started):
+        with self._lock:
+            self.batches += 1
+            self.requests += len(batch)
+            self.rows += n_rows
+            self.max_batch_seen = max(self.max_batch_seen, n_rows)
+            for _, _, submitted in batch:
+                wait = started - submitted
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "window_ms": self.window * 1000,
+                "max_batch_rows": self.max_batch_rows,
+                "batches": self.batches,
+                "failed_batches": self.failed_batches,
+                "timeouts": self.timeouts,
+                "requests": self.requests,
+                "rows": self.rows,
+                "avg_requests_per_batch": self.requests / self.batches if self.batches else 0.0,
+                "avg_rows_per_batch": self.rows / self.batches if self.batches else 0.0,
+                "max_rows_per_batch": self.max_batch_seen,
+                "avg_queue_wait_ms": self.total_wait / self.requests * 1000 if self.requests else 0.0,
+                "max_queue_wait_ms": self.max_wait * 1000
+            }
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+
+class ParetoFrontier:
+    """
+    Risk/price Pareto frontier of a set of advice candidates (the rows of `frame` selected by `mask`,
+    with risk_norm, price_norm and lt columns). For non-negative weights the row minimizing
+    risk_norm * w_risk + price_norm * w_price always lies on the frontier, so once it is built every
+    weight pair is answered by a walk over the few frontier rows instead of re-scoring and re-sorting
+    all candidates. Rows with the same best score go to the shortest lead time (then the first row).
+    """
+    def __init__(self, frame, mask=None):
+        self.frame = frame
+        self.rows = np.arange(len(frame)) if mask is None else np.flatnonzero(np.asarray(mask))
+        risk = frame['risk_norm'].to_numpy(dtype=np.float64)[self.rows]
+        price = frame['price_norm'].to_numpy(dtype=np.float64)[self.rows]
+        lead_time = frame['lt'].to_numpy(dtype=np.float64)[self.rows]
+
+        # Rows with a NaN score never win (a constant curve normalizes to NaN everywhere)
+        valid = np.flatnonzero(~(np.isnan(risk) | np.isnan(price)))
+
+        # Sort by risk, then price, then lead time: of identical points only the shortest lead time is kept
+        order = valid[np.lexsort((lead_time[valid], price[valid], risk[valid]))]
+        sorted_price = price[order]
+
+        # Keep the rows cheaper than every row of lower (or equal) risk before them
+        keep = np.ones(len(order), dtype=bool)
+        if len(order) > 1:
+            keep[1:] = sorted_price[1:] < np.minimum.accumulate(sorted_price)[:-1]
+
+        frontier = order[keep]
+        self.positions = self.rows[frontier]
+        self.risk = risk[frontier]
+        self.price = price[frontier]
+        self.lead_time = lead_time[frontier]
+
+        # A zero weight ties every row of the best price (or risk), including the frontier drops of a
+        # higher risk (or price); the shortest lead time of those is picked up front
+        self._zero_weight_rows = {}
+        if len(valid):
+            def shortest(candidates):
+                return self.rows[candidates[np.argmin(lead_time[candidates])]]
+
+            self._zero_weight_rows = {
+                'risk': shortest(valid[price[valid] == price[valid].min()]),
+                'price': shortest(valid[risk[valid] == risk[valid].min()]),
+                'both': shortest(valid)
+            }
+
+        # Values of the rows picked so far; enlarging a row Series with total_score is slow
+        self._row_values = {}
+        self._index = frame.columns.append(pd.Index(['total_score']))
+
+    def __len__(self):
+        return len(self.positions)
+
+    @property
+    def empty(self):
+        return len(self.rows) == 0
+
+    def best(self, w_risk, w_price):
+        """Candidate row with the lowest weighted score (with its total_score), or None without candidates."""
+        if self.empty:
+            return None
+
+        if len(self.positions) == 0:
+            # Every score is NaN: like sorting the scores, fall back to the first candidate
+            position, score = self.rows[0], np.nan
+        else:
+            scores = (self.risk * w_risk) + (self.price * w_price)
+            tied = np.flatnonzero(scores == scores.min())
+            best = tied[np.argmin(self.lead_time[tied])]
+            position, score = self.positions[best], scores[best]
+
+            if w_risk == 0 or w_price == 0:
+                position = self._zero_weight_rows['both' if w_risk == w_price else 'risk' if w_risk == 0 else 'price']
+
+        values = self._row_values.get(position)
+        if values is None:
+            values = self._row_values[position] = self.frame.iloc[position].to_numpy()
+
+        return pd.Series(
+            np.append(values, score),
+            index=self._index,
+            name=self.frame.index[position]
+        )
@@ -0,0 +1,142 @@
+import threading
+from datetime import date, datetime
+import numpy as np
+import pandas as pd
+from ml_logic.processors.data_utils import calculate_stay_distribution
+
+WEEKEND_NIGHTS = [4, 5]  # Friday and Saturday nights
+
+class CalendarTable:
+    """Day-indexed arrays starting today: weekday, ISO week, month and weekend-night prefix sums."""
+    def __init__(self, start, horizon_days):
+        self.start = start
+        self.start_day = np.datetime64(start, 'D')
+        self.dates = self.start_day + np.arange(horizon_days)
+
+        index = pd.DatetimeIndex(self.dates)
+        iso = index.isocalendar()
+        self.weekdays = index.weekday.to_numpy()
+        self.years = index.year.to_numpy()
+        self.months = index.month.to_numpy()
+        self.iso_years = iso['year'].to_numpy(dtype=np.int64)
+        self.iso_weeks = iso['week'].to_numpy(dtype=np.int64)
+        self.date_strings = np.datetime_as_string(self.dates, unit='D')
+
+        # weekend_prefix[i] = number of Fri/Sat nights in the first i days
+        self.weekend_prefix = np.concatenate([[0], np.cumsum(np.isin(self.weekdays, WEEKEND_NIGHTS))])
+
+    def __len__(self):
+        return len(self.dates)
+
+    def offset_of(self, day):
+        return int((np.datetime64(day, 'D') - self.start_day).astype(np.int64))
+
+    def date_string(self, offset):
+        return str(self.start_day + offset)
+
+
+class StayCalendar:
+    """
+    Calendar lookups for the booking service, rebuilt on the first use after midnight.
+    The table grows on demand when a stay runs past its horizon.
+    """
+    def __init__(self, horizon_days):
+        self.horizon_days = horizon_days
+        self._lock = threading.Lock()
+        self._table = CalendarTable(date.today(), horizon_days)
+
+    def get_table(self, min_days=0):
+        table = self._table
+        today = date.today()
+
+        if table.start != today or len(table) < min_days:
+            with self._lock:
+                table = self._table
+                if table.start != today or len(table) < min_days:
+                    table = CalendarTable(today, max(self.horizon_days, 2 * min_days))
+                    self._table = table
+
+        return table
+
+    def get_stay_distribution(self, start_date_str, end_date_str):
+        table = self.get_table()
+        start = table.offset_of(datetime.strptime(start_date_str, '%Y-%m-%d').date())
+        end = table.offset_of(datetime.strptime(end_date_str, '%Y-%m-%d').date())
+
+        # Stays starting in the past are rare, compute them directly
+        if start < 0:
+            return calculate_stay_distribution(start_date_str, end_date_str)
+
+        # date_range(start, end, inclusive='left') still yields the start day when start == end
+        nights = 1 if end == start else max(0, end - start)
+        table = self.get_table(start + nights + 1)
+        weekend_nights = int(table.weekend_prefix[start + nights] - table.weekend_prefix[start])
+
+        return weekend_nights, nights - weekend_nights
+
+    def get_stay_grid(self, first_offset, days, max_nights):
+        """
+        Every stay of 1..max_nights nights arriving on one of `days` days from today + first_offset.
+        Returns the calendar table, the arrival offsets, the stay lengths and a days x nights
+        matrix of the Friday/Saturday nights of each stay.
+        """
+        table = self.get_table(first_offset + days + max_nights + 1)
+        starts = np.arange(first_offset, first_offset + days)
+        nights = np.arange(1, max_nights + 1)
+        weekend_nights = table.weekend_prefix[starts[:, None] + nights] - table.weekend_prefix[starts][:, None]
+
+        return table, starts, nights, weekend_nights
+
+    def _iso_week_mondays(self, iso_years, iso_weeks):
+        # Same arithmetic as pd.to_datetime('%G-W%V-1'): Monday of the week containing Jan 4th
+        jan_4th = (iso_years - 1970).astype('datetime64[Y]').astype('datetime64[D]') + 3
+        jan_4th_weekday = (jan_4th.astype(np.int64) + 3) % 7
+
+        return jan_4th - jan_4th_weekday + (iso_weeks - 1) * 7
+
+    def match_check_ins(self, years, months, weeks, target_weekends, target_weeks):
+        """
+        Batch check-in matching for advice rows. For each (year, month, ISO week) find the first
+        future day of that week, inside that month, whose stay has the target weekend/week split.
+        Returns one (check_in, check_out, stay_dates) tuple per row.
+        """
+        years = np.asarray(years, dtype=np.int64)
+        months = np.asarray(months, dtype=np.int64)
+        weeks = np.asarray(weeks, dtype=np.int64)
+        target_weekends = np.broadcast_to(np.asarray(target_weekends, dtype=np.int64), years.shape)
+        total_nights = target_weekends + np.broadcast_to(np.asarray(target_weeks, dtype=np.int64), years.shape)
+
+        if len(years) == 0:
+            return []
+
+        mondays = self._iso_week_mondays(years, weeks)
+        last_day = self.get_table().offset_of(mondays.max()) + 6
+        table = self.get_table(last_day + int(total_nights.max()) + 1)
+        candidates = (mondays - table.start_day).astype(np.int64)[:, None] + np.arange(7)
+
+        in_table = candidates >= 0
+        safe = np.where(in_table, candidates, 0)
+        usable = in_table & (table.months[safe] == months[:, None])
+        weekend_counts = table.weekend_prefix[safe + total_nights[:, None]] - table.weekend_prefix[safe]
+        matched = usable & (weekend_counts == target_weekends[:, None])
+
+        results = []
+        for i in range(len(years)):
+            nights = int(total_nights[i])
+
+            if matched[i].any():
+                check_in = int(candidates[i, matched[i].argmax()])
+                results.append((
+                    table.date_strings[check_in],
+                    table.date_string(check_in + nights),
+                    table.date_strings[check_in:check_in + nights].tolist()
+                ))
+            elif usable[i].any():
+                # Fallback: If cannot match, return the first usable day of the week as start date
+                check_in = int(candidates[i, usable[i].argmax()])
+                results.append((table.date_strings[check_in], table.date_string(check_in + nights), []))
+            else:
+                check_in = int(candidates[i, -1])
+                results.append((table.date_string(check_in), table.date_string(check_in + nights), []))
+
+        return [(str(check_in), str(check_out), stay_dates) for check_in, check_out, stay_dates in results]
@@ -0,0 +1,82 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+
+class SweepCache:
+    """
+    Bounded LRU cache of lead-time sweep tables (or other per-profile DataFrames / arrays) shared
+    across requests. Entries are keyed by booking profile and only live for one calendar day.
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._day = None
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rollovers = 0
+
+    def _rollover(self, day):
+        # A new calendar day shifts every simulated arrival date, drop everything
+        if self._day != day:
+            if self._day is not None:
+                self.rollovers += 1
+            self._entries.clear()
+            self.current_bytes = 0
+            self._day = day
+
+    def get(self, key, day):
+        with self._lock:
+            self._rollover(day)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, day, table):
+        if isinstance(table, np.ndarray):
+            size = int(table.nbytes)
+        else:
+            size = int(table.memory_usage(index=True, deep=True).sum())
+
+        with self._lock:
+            self._rollover(day)
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+
+            if size > self.max_bytes:
+                return
+
+            while self._entries and self.current_bytes + size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+            self._entries[key] = (table, size)
+            self.current_bytes += size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "day": str(self._day) if self._day is not None else None,
+                "entries": len(self._entries),
+                "current_bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "rollovers": self.rollovers
+            }
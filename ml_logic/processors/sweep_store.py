@@ -0,0 +1,168 @@
+import json
+import os
+import struct
+import tempfile
+import threading
+import time
+import numpy as np
+
+MAGIC = b'TPSWEEP1'
+ALIGNMENT = 64
+
+def _to_builtin(value):
+    return value.item() if hasattr(value, 'item') else value
+
+def append_profile_log(path, profiles):
+    """Append one JSON line per booking profile; a single write keeps lines whole across workers."""
+    lines = ''.join(json.dumps({col: _to_builtin(v) for col, v in profile.items()}) + '\n' for profile in profiles)
+    try:
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(lines)
+    except OSError as e:
+        # The log only feeds the nightly precompute, never fail a request over it
+        print(f"⚠️ Could not write booking profile log {path}: {e}")
+
+def read_profile_log(path, features):
+    """Yield the profile key of every logged line, skipping lines cut short or missing a feature."""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                profile = json.loads(line)
+                yield tuple(profile[col] for col in features)
+            except (ValueError, KeyError):
+                continue
+
+def write_sweep_store(path, day, features, keys, risks, prices):
+    """
+    Write the precomputed sweeps as one file: magic, header length, JSON header, then the
+    risk and price matrices (float32, one row per profile, one column per lead time).
+    """
+    risks = np.ascontiguousarray(risks, dtype=np.float32)
+    prices = np.ascontiguousarray(prices, dtype=np.float32)
+    if risks.shape != prices.shape or risks.shape[0] != len(keys):
+        raise ValueError("risk and price matrices must have one row per profile")
+
+    header = {
+        'day': str(day),
+        'features': list(features),
+        'keys': [[_to_builtin(v) for v in key] for key in keys],
+        'n_lts': int(risks.shape[1])
+    }
+    header_bytes = json.dumps(header).encode('utf-8')
+    data_offset = -(-(len(MAGIC) + 8 + len(header_bytes)) // ALIGNMENT) * ALIGNMENT
+
+    # Write next to the target and rename, so running services never map a half-written file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<Q', len(header_bytes)))
+            f.write(header_bytes)
+            f.write(b'\0' * (data_offset - f.tell()))
+            f.write(risks.tobytes())
+            f.write(prices.tobytes())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class SweepStore:
+    """
+    Read side of the precomputed sweep file. The curves are memory-mapped, so lookups only
+    touch the pages of the requested profile and every worker shares them through the page cache.
+    A file is only used on the day it was computed for; a newer file is picked up on the next check.
+    """
+    def __init__(self, path, features, check_interval=60):
+        self.path = path
+        self.features = list(features)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._data = None
+        self._mtime = None
+        self._checked_at = None
+
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+
+    def _load(self):
+        with open(self.path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{self.path} is not a sweep store file")
+            header_length, = struct.unpack('<Q', f.read(8))
+            header = json.loads(f.read(header_length))
+
+        if header['features'] != self.features:
+            raise ValueError("sweep store was built for other profile features")
+
+        n_profiles, n_lts = len(header['keys']), header['n_lts']
+        data_offset = -(-(len(MAGIC) + 8 + header_length) // ALIGNMENT) * ALIGNMENT
+        matrix_bytes = n_profiles * n_lts * 4
+
+        return {
+            'day': header['day'],
+            'index': {tuple(key): i for i, key in enumerate(header['keys'])},
+            'n_lts': n_lts,
+            'risk': np.memmap(self.path, dtype=np.float32, mode='r', offset=data_offset, shape=(n_profiles, n_lts)) if n_profiles else None,
+            'price': np.memmap(self.path, dtype=np.float32, mode='r', offset=data_offset + matrix_bytes, shape=(n_profiles, n_lts)) if n_profiles else None
+        }
+
+    def _refresh(self):
+        # Stat the file at most every check_interval seconds
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            self._data, self._mtime = None, None
+            return
+
+        if mtime != self._mtime:
+            try:
+                self._data = self._load()
+                self.loads += 1
+            except (OSError, ValueError, KeyError) as e:
+                print(f"⚠️ Could not load sweep store {self.path}: {e}")
+                self._data = None
+            self._mtime = mtime
+
+    def get_curves(self, key, day):
+        """Return the (risk, price) float32 curves indexed by lead time, or None if the profile is not stored."""
+        if not self.path:
+            return None
+
+        with self._lock:
+            data = self._data
+            if data is None or data['day'] != str(day):
+                self._refresh()
+                data = self._data
+
+            row = None
+            if data is not None and data['day'] == str(day):
+                row = data['index'].get(key)
+
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        return data['risk'][row], data['price'][row]
+
+    def get_stats(self):
+        with self._lock:
+            data = self._data
+            return {
+                "path": self.path,
+                "day": data['day'] if data else None,
+                "profiles": len(data['index']) if data else 0,
+                "max_lt": data['n_lts'] - 1 if data else None,
+                "hits": self.hits,
+                "misses": self.misses,
+                "loads": self.loads
+            }
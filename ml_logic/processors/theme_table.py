@@ -0,0 +1,135 @@
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+import requests
+from ml_logic.processors.artifact_cache import fetch_artifact, is_remote
+
+# Categorical theme features in table axis order (after the age bucket, before the budget)
+TABLE_CATEGORIES = ['Gender', 'Nationality', 'Travel_Companions']
+
+class ThemeTable:
+    """
+    Predicted theme (label-encoder index) of every combination of age, gender, nationality,
+    travel companions and budget level the theme model knows. Consecutive ages with the same
+    predictions for every other combination share one bucket, so the uint8 table only has as
+    many age rows as the model has distinct age responses.
+    """
+    def __init__(self, min_age, age_buckets, categories, table):
+        self.min_age = int(min_age)
+        self.age_buckets = np.asarray(age_buckets, dtype=np.int64)
+        self.categories = {feature: list(values) for feature, values in categories.items()}
+        self.table = np.asarray(table, dtype=np.uint8)
+        self._positions = {feature: {value: i for i, value in enumerate(values)} for feature, values in self.categories.items()}
+
+    @property
+    def max_age(self):
+        return self.min_age + len(self.age_buckets) - 1
+
+    def lookup(self, age, gender, nationality, companion_label, budget_level):
+        """Theme index of one profile, or None when a value is outside the table."""
+        index = self.lookup_many([age], [gender], [nationality], [companion_label], [budget_level])[0]
+        return None if index < 0 else int(index)
+
+    def lookup_many(self, ages, genders, nationalities, companion_labels, budget_levels):
+        """Theme indices of many profiles, -1 where a value is outside the table."""
+        ages = np.array([age if isinstance(age, (int, np.integer)) else -1 for age in ages], dtype=np.int64)
+        budget_levels = np.array([-1 if level is None else level for level in budget_levels], dtype=np.int64)
+        positions = [
+            np.array([self._positions[feature].get(value, -1) for value in values], dtype=np.int64)
+            for feature, values in zip(TABLE_CATEGORIES, (genders, nationalities, companion_labels))
+        ]
+
+        known = (ages >= self.min_age) & (ages <= self.max_age) & (budget_levels >= 0) & (budget_levels < self.table.shape[-1])
+        for feature_positions in positions:
+            known &= feature_positions >= 0
+
+        indices = np.full(len(ages), -1, dtype=np.int64)
+        indices[known] = self.table[(
+            self.age_buckets[ages[known] - self.min_age],
+            *[feature_positions[known] for feature_positions in positions],
+            budget_levels[known]
+        )]
+        return indices
+
+    def save(self, path):
+        # Write next to the target and rename, so running services never read a half-written file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez_compressed(
+                    f,
+                    min_age=self.min_age,
+                    age_buckets=self.age_buckets,
+                    table=self.table,
+                    **{f'categories_{feature}': np.array(values, dtype=str) for feature, values in self.categories.items()}
+                )
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            categories = {feature: data[f'categories_{feature}'].tolist() for feature in TABLE_CATEGORIES}
+            return cls(data['min_age'], data['age_buckets'], categories, data['table'])
+
+
+def load_theme_table(path):
+    """The precomputed theme table (a local file or a published artifact), or None when it has not been built."""
+    if is_remote(path):
+        try:
+            path = fetch_artifact(path)
+        except requests.RequestException as e:
+            print(f"⚠️ Could not fetch theme table {path} ({e}), themes are predicted by the model")
+            return None
+
+    if not os.path.exists(path):
+        print(f"⚠️ No theme table at {path}, themes are predicted by the model")
+        return None
+
+    try:
+        return ThemeTable.load(path)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"⚠️ Could not load theme table {path}: {e}")
+        return None
+
+def get_model_categories(preprocessor):
+    """Values of each categorical theme feature known to the fitted preprocessor's one-hot encoders."""
+    categories = {}
+    for _, transformer, columns in preprocessor.transformers_:
+        for column, values in zip(columns, getattr(transformer, 'categories_', [])):
+            categories[column] = list(values)
+
+    missing = [feature for feature in TABLE_CATEGORIES if feature not in categories]
+    if missing:
+        raise ValueError(f"theme preprocessor has no categories for {missing}")
+    return {feature: categories[feature] for feature in TABLE_CATEGORIES}
+
+def build_theme_table(predict_indices, categories, min_age, max_age, budget_levels=3, chunk_rows=50000):
+    """
+    Score every profile of the grid with predict_indices (a THEME_FEATURES DataFrame, budget already
+    mapped to its level -> label-encoder indices) and bucket the ages with identical predictions.
+    """
+    ages = np.arange(min_age, max_age + 1)
+    axes = [ages, *[np.arange(len(categories[feature])) for feature in TABLE_CATEGORIES], np.arange(budget_levels)]
+    shape = tuple(len(axis) for axis in axes)
+    grid = [axis.ravel() for axis in np.meshgrid(*axes, indexing='ij')]
+
+    frame = pd.DataFrame({
+        'Age': grid[0],
+        **{feature: np.array(categories[feature], dtype=object)[codes] for feature, codes in zip(TABLE_CATEGORIES, grid[1:-1])},
+        'Budget_Category': grid[-1]
+    })
+    predictions = np.concatenate([
+        predict_indices(frame.iloc[start:start + chunk_rows]) for start in range(0, len(frame), chunk_rows)
+    ]).reshape(shape)
+
+    # A new bucket starts wherever an age changes any prediction
+    changes = np.r_[True, (predictions[1:] != predictions[:-1]).reshape(len(ages) - 1, -1).any(axis=1)]
+    age_buckets = np.cumsum(changes) - 1
+
+    return ThemeTable(min_age, age_buckets, categories, predictions[changes])
@@ -0,0 +1,277 @@
+import math
+import numpy as np
+
+# LightGBM missing value handling of a split
+MISSING_NONE, MISSING_ZERO, MISSING_NAN = 0, 1, 2
+MISSING_TYPES = {'None': MISSING_NONE, 'Zero': MISSING_ZERO, 'NaN': MISSING_NAN}
+# LightGBM treats |x| <= kZeroThreshold (a float32 constant) as zero
+ZERO_THRESHOLD = float(np.float32(1e-35))
+MAX_THRESHOLD = 1e300
+
+OUTPUT_TRANSFORMS = {'regression': 'identity', 'binary': 'sigmoid'}
+
+class FlatTreeEnsemble:
+    """
+    LightGBM tree ensemble flattened into contiguous node arrays and evaluated with NumPy.
+    All trees share one node table; leaves are nodes with feature -1 that point to themselves.
+    Rows are walked through every tree at once, one tree level per step.
+    """
+    def __init__(self, dump):
+        if dump.get('num_class', 1) != 1 or dump.get('num_tree_per_iteration', 1) != 1:
+            raise ValueError("Only single-output tree models are supported")
+
+        objective = dump['objective'].split()
+        if objective[0] not in OUTPUT_TRANSFORMS:
+            raise ValueError(f"Unsupported objective '{objective[0]}'")
+        self.output_transform = OUTPUT_TRANSFORMS[objective[0]]
+        self.sigmoid = 1.0
+        for option in objective[1:]:
+            if option.startswith('sigmoid:'):
+                self.sigmoid = float(option.split(':')[1])
+
+        self.n_features = dump['max_feature_idx'] + 1
+        self.average_output = dump.get('average_output', False)
+        self._flatten([tree['tree_structure'] for tree in dump['tree_info']])
+
+    @classmethod
+    def from_lgbm(cls, estimator):
+        """Flatten a fitted LGBMClassifier/LGBMRegressor (the trees sklearn's predict would use)."""
+        booster = getattr(estimator, 'booster_', None)
+        if booster is None:
+            raise ValueError(f"Not a fitted LightGBM model: {type(estimator).__name__}")
+        return cls(booster.dump_model())
+
+    def _flatten(self, trees):
+        features, thresholds, lefts, rights = [], [], [], []
+        default_lefts, missing_types, is_categorical, values = [], [], [], []
+        cat_offsets, cat_words, cat_bitsets = [], [], []
+        roots = []
+        max_depth = 0
+
+        def add_node():
+            for column in (features, thresholds, lefts, rights, default_lefts, missing_types, is_categorical, values, cat_offsets, cat_words):
+                column.append(0)
+            return len(features) - 1
+
+        for tree in trees:
+            # Iterative walk with explicit (node, slot, depth) triples: deep trees would hit the recursion limit
+            root = add_node()
+            roots.append(root)
+            stack = [(tree, root, 0)]
+
+            while stack:
+                node, idx, depth = stack.pop()
+                max_depth = max(max_depth, depth)
+
+                if 'leaf_value' in node or 'split_feature' not in node:
+                    features[idx] = -1
+                    lefts[idx] = rights[idx] = idx
+                    values[idx] = node.get('leaf_value', 0.0)
+                    continue
+
+                features[idx] = node['split_feature']
+                default_lefts[idx] = node['default_left']
+                missing_types[idx] = MISSING_TYPES[node['missing_type']]
+
+                if node['decision_type'] == '==':
+                    categories = [int(c) for c in str(node['threshold']).split('||')]
+                    bitset = np.zeros(max(categories) // 32 + 1, dtype=np.uint32)
+                    for c in categories:
+                        bitset[c // 32] |= np.uint32(1 << (c % 32))
+
+                    is_categorical[idx] = True
+                    cat_offsets[idx] = sum(len(b) for b in cat_bitsets)
+                    cat_words[idx] = len(bitset)
+                    cat_bitsets.append(bitset)
+                elif node['decision_type'] == '<=':
+                    thresholds[idx] = node['threshold']
+                else:
+                    raise ValueError(f"Unsupported decision type '{node['decision_type']}'")
+
+                lefts[idx] = add_node()
+                rights[idx] = add_node()
+                stack.append((node['left_child'], lefts[idx], depth + 1))
+                stack.append((node['right_child'], rights[idx], depth + 1))
+
+        self.roots = np.array(roots, dtype=np.int64)
+        self.feature = np.array(features, dtype=np.int64)
+        self.threshold = np.array(thresholds, dtype=np.float64)
+        self.left = np.array(lefts, dtype=np.int64)
+        self.right = np.array(rights, dtype=np.int64)
+        # children[2 * node + went_right]: one gather per level instead of two plus a select
+        self.children = np.column_stack([self.left, self.right]).ravel()
+        self.default_left = np.array(default_lefts, dtype=bool)
+        self.missing_type = np.array(missing_types, dtype=np.int8)
+        self.is_categorical = np.array(is_categorical, dtype=bool)
+        self.value = np.array(values, dtype=np.float64)
+        self.cat_offset = np.array(cat_offsets, dtype=np.int64)
+        self.cat_words = np.array(cat_words, dtype=np.int64)
+        self.cat_bitset = np.concatenate(cat_bitsets) if cat_bitsets else np.zeros(0, dtype=np.uint32)
+        self.has_categorical = bool(cat_bitsets)
+        self.has_zero_missing = bool((self.missing_type == MISSING_ZERO).any())
+        self.max_depth = max_depth
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def _go_left_numerical(self, nodes, fvals):
+        missing_type = self.missing_type[nodes]
+        is_nan = np.isnan(fvals)
+
+        # NaN on a split without NaN handling is treated as 0.0
+        fvals = np.where(is_nan & (missing_type != MISSING_NAN), 0.0, fvals)
+        is_missing = (
+            ((missing_type == MISSING_ZERO) & (np.abs(fvals) <= ZERO_THRESHOLD))
+            | ((missing_type == MISSING_NAN) & is_nan)
+        )
+        return np.where(is_missing, self.default_left[nodes], fvals <= self.threshold[nodes])
+
+    def _go_left_categorical(self, nodes, fvals):
+        # NaN and negative categories go right; others go left when their bit is set
+        valid = ~np.isnan(fvals)
+        categories = np.where(valid, fvals, -1).astype(np.int64)
+        word = categories // 32
+        valid &= (categories >= 0) & (word < self.cat_words[nodes])
+
+        bits = self.cat_bitset[np.where(valid, self.cat_offset[nodes] + word, 0)] if len(self.cat_bitset) else np.zeros(len(nodes), dtype=np.uint32)
+        return valid & (((bits >> np.where(valid, categories % 32, 0).astype(np.uint32)) & 1) == 1)
+
+    def _go_left(self, nodes, fvals, plain):
+        # Without NaNs, Zero-as-missing splits or categorical splits a node is a plain comparison
+        if plain:
+            return fvals <= self.threshold[nodes]
+
+        go_left = self._go_left_numerical(nodes, fvals)
+        if self.has_categorical:
+            categorical = self.is_categorical[nodes]
+            if categorical.any():
+                go_left[categorical] = self._go_left_categorical(nodes[categorical], fvals[categorical])
+        return go_left
+
+    def get_leaf_values(self, X):
+        """(n_rows, n_trees) matrix of the leaf value each row reaches in each tree."""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected a matrix with {self.n_features} columns, got shape {X.shape}")
+
+        # LightGBM reads dense rows sparsely: values within the zero threshold are dropped as 0.0
+        X = np.where(np.abs(X) <= ZERO_THRESHOLD, 0.0, X)
+
+        plain = not (self.has_categorical or self.has_zero_missing or np.isnan(X).any())
+        n_rows, n_trees = len(X), self.n_trees
+        nodes = np.tile(self.roots, n_rows)
+        rows = np.repeat(np.arange(n_rows), n_trees)
+        pairs = np.arange(n_rows * n_trees)
+        leaves = np.empty(n_rows * n_trees, dtype=np.int64)
+
+        # Keep only the (row, tree) pairs that have not reached a leaf yet
+        while len(pairs):
+            features = self.feature[nodes]
+            at_leaf = features < 0
+            leaves[pairs[at_leaf]] = nodes[at_leaf]
+
+            inner = ~at_leaf
+            pairs, nodes, rows, features = pairs[inner], nodes[inner], rows[inner], features[inner]
+            go_left = self._go_left(nodes, X[rows, features], plain)
+            nodes = self.children[2 * nodes + ~go_left]
+
+        return self.value[leaves].reshape(n_rows, n_trees)
+
+    def predict_raw(self, X):
+        leaf_values = self.get_leaf_values(X)
+        if leaf_values.shape[1] == 0:
+            return np.zeros(len(leaf_values))
+
+        # Sum the trees in order, like LightGBM, so the result matches to the last bit
+        raw = np.cumsum(leaf_values, axis=1)[:, -1]
+        if self.average_output:
+            raw = raw / leaf_values.shape[1]
+        return raw
+
+    def predict(self, X):
+        if self.output_transform != 'identity':
+            raise ValueError("predict is only available for regression models, use predict_proba")
+        return self.predict_raw(X)
+
+    def predict_proba(self, X):
+        if self.output_transform != 'sigmoid':
+            raise ValueError("predict_proba is only available for binary models")
+
+        # math.exp is the same libm exp LightGBM calls; np.exp may differ in the last bit
+        exps = np.fromiter((math.exp(v) for v in (-self.sigmoid * self.predict_raw(X)).tolist()), dtype=np.float64)
+        prob = 1.0 / (1.0 + exps)
+        return np.column_stack([1.0 - prob, prob])
+
+
+def build_parity_matrix(ensemble, n_rows=2000, seed=42):
+    """
+    Rows over the model's own split points: every feature takes split thresholds, their
+    neighbouring floats, split categories, zero and NaN, so each branch is taken both ways.
+    """
+    rng = np.random.default_rng(seed)
+    inner = ensemble.feature >= 0
+    X = np.zeros((n_rows, ensemble.n_features))
+
+    for f in range(ensemble.n_features):
+        split = inner & (ensemble.feature == f)
+        numeric = ensemble.threshold[split & ~ensemble.is_categorical]
+        candidates = [0.0, np.nan, -1.0]
+        candidates += numeric.tolist() + np.nextafter(numeric, np.inf).tolist() + np.nextafter(numeric, -np.inf).tolist()
+        if ensemble.has_categorical and (split & ensemble.is_categorical).any():
+            candidates += list(range(32 * int(ensemble.cat_words[split].max()) + 1))
+        # Dumps write infinite bin edges as +-1e300; values beyond them are not meaningful inputs
+        candidates = np.array(candidates, dtype=np.float64)
+        candidates = candidates[~(np.abs(candidates) > MAX_THRESHOLD)]
+        X[:, f] = rng.choice(candidates, n_rows)
+
+    return X
+
+def find_tree_mismatches(estimator, ensemble, X, predict_method='predict'):
+    """Rows of `X` whose raw score or prediction from the flattened ensemble differs from the LightGBM model."""
+    differs = ensemble.predict_raw(X) != estimator.predict(X, raw_score=True)
+    differs |= (getattr(ensemble, predict_method)(X) != getattr(estimator, predict_method)(X)).reshape(len(X), -1).any(axis=1)
+    return np.flatnonzero(differs)
+
+
+class TreeCells:
+    """
+    Cells of tree ensembles along a few features. Rows that differ only in those features and fall
+    between the same split thresholds of every tree reach the same leaves, so they predict the same.
+    """
+    def __init__(self, thresholds):
+        # feature -> sorted numeric split thresholds, or None when a categorical split makes every value its own cell
+        self.thresholds = thresholds
+
+    @classmethod
+    def from_trees(cls, models, features):
+        """`models` pairs each FlatTreeEnsemble with its {feature: model matrix column} map of the plain numeric features."""
+        thresholds = {}
+        for feature in features:
+            values = []
+            for ensemble, columns in models:
+                split = (ensemble.feature >= 0) & (ensemble.feature == columns.get(feature, -1))
+                if feature not in columns or (split & ensemble.is_categorical).any():
+                    values = None
+                    break
+                values.append(ensemble.threshold[split])
+            thresholds[feature] = None if values is None else np.unique(np.concatenate(values))
+        return cls(thresholds)
+
+    def get_cells(self, columns):
+        """Cell id of every row; rows with equal ids share a cell."""
+        cells = np.zeros(len(np.asarray(columns[next(iter(self.thresholds))])), dtype=np.int64)
+        for feature, thresholds in self.thresholds.items():
+            values = np.asarray(columns[feature], dtype=np.float64)
+            if thresholds is None:
+                code = np.unique(values, return_inverse=True)[1].reshape(-1)
+                n_codes = len(values)
+            else:
+                # x <= threshold goes left: the cell is the number of thresholds below x;
+                # zero and NaN may take a split's default direction instead, so they get cells of their own
+                n_codes = len(thresholds) + 3
+                code = np.searchsorted(thresholds, values, side='left') + 2
+                code = np.where(np.abs(values) <= ZERO_THRESHOLD, 1, code)
+                code = np.where(np.isnan(values), 0, code)
+            cells = cells * n_codes + code
+        return cells
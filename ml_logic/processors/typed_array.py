@@ -0,0 +1,44 @@
+import base64
+import numpy as np
+
+# plotly.js typed-array dtype codes of the NumPy dtypes it can decode
+TYPED_ARRAY_DTYPES = {
+    'int8': 'i1', 'uint8': 'u1', 'int16': 'i2', 'uint16': 'u2',
+    'int32': 'i4', 'uint32': 'u4', 'float32': 'f4', 'float64': 'f8'
+}
+
+def _narrow_integers(array):
+    # plotly.js has no 64-bit integers: use the smallest type that holds every value
+    candidates = [np.int8, np.int16, np.int32] if array.dtype.kind == 'i' else [np.uint8, np.uint16, np.uint32]
+    low, high = array.min(), array.max()
+    for dtype in candidates:
+        info = np.iinfo(dtype)
+        if low >= info.min and high <= info.max:
+            return array.astype(dtype)
+    return None
+
+def to_typed_array(values, dtype=None):
+    """
+    plotly.js typed-array spec of a numeric array: {"dtype": code, "bdata": base64 of the little-endian
+    bytes} plus "shape" ("rows, cols") for 2-D and up. `dtype` casts the values first; arrays plotly.js
+    cannot decode (empty, non-numeric, 64-bit integers out of 32-bit range) come back as plain lists.
+    """
+    array = np.asarray(values, dtype=dtype)
+    if array.size == 0:
+        return array.tolist()
+
+    if array.dtype.name in ('int64', 'uint64'):
+        array = _narrow_integers(array)
+        if array is None:
+            return np.asarray(values).tolist()
+
+    if array.dtype.name not in TYPED_ARRAY_DTYPES:
+        return array.tolist()
+
+    spec = {
+        "dtype": TYPED_ARRAY_DTYPES[array.dtype.name],
+        "bdata": base64.b64encode(array.astype(array.dtype.newbyteorder('<'), copy=False).tobytes()).decode('ascii')
+    }
+    if array.ndim > 1:
+        spec["shape"] = ", ".join(str(size) for size in array.shape)
+    return spec
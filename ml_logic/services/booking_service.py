@@ -1,33 +1,127 @@
 import pandas as pd
-import joblib
+import numpy as np
 import plotly.graph_objects as go
 import plotly.io as pio
 import calendar
 import json
-import requests
-import io
-from ml_logic.config import CANCELLATION_RISK_MODEL_PATH, PRICE_MODEL_PATH, COUNTRY_MONTHLY_STATS_PATH, BOOKING_FEATURES, LEAD_TIME_CONFIG, IS_LOCAL
-from ml_logic.processors.data_utils import calculate_lead_time, get_month, determine_customer_type, calculate_stay_distribution
-from ml_logic.processors.geo_tools import get_country_iso_code
+from ml_logic.config import BOOKING_FEATURES, HOTEL_TYPES, LEAD_TIME_CONFIG, SWEEP_FEATURES, SWEEP_PROFILE_FEATURES, SWEEP_CACHE_MAX_BYTES, SWEEP_STORE_PATH, BOOKING_PROFILE_LOG_PATH, INFERENCE_DISPATCHER_ENABLED, INFERENCE_BATCH_WINDOW_MS, INFERENCE_MAX_BATCH_ROWS, INFERENCE_DISPATCH_TIMEOUT_S, CALENDAR_HORIZON_DAYS, STAY_GRID_DAYS, STAY_GRID_MAX_NIGHTS, STAY_GRID_PROFILE_FEATURES, STAY_GRID_CACHE_MAX_BYTES, TREE_EVALUATOR, TREE_EVALUATOR_MAX_ROWS, IS_LOCAL
+from ml_logic.processors.data_utils import calculate_lead_time, get_month, determine_customer_type
+from ml_logic.processors.geo_tools import get_country_iso_code, get_country_iso_codes
+from ml_logic.processors.sweep_cache import SweepCache
+from ml_logic.processors.sweep_store import SweepStore, append_profile_log
+from ml_logic.processors.stay_calendar import StayCalendar
+from ml_logic.processors.pareto_frontier import ParetoFrontier
+from ml_logic.model_registry import model_registry
+from ml_logic.processors.feature_encoder import CompiledFeatureEncoder, check_encoder_parity
+from ml_logic.processors.inference_dispatcher import InferenceDispatcher
+from ml_logic.processors.tree_ensemble import FlatTreeEnsemble, TreeCells
+from ml_logic.processors.typed_array import to_typed_array
+from ml_logic.stage_timing import timed_stage
 
 class BookingService:
     def __init__(self):
-        if IS_LOCAL:
-            self.risk_model = joblib.load(CANCELLATION_RISK_MODEL_PATH)
-            self.price_model = joblib.load(PRICE_MODEL_PATH)
-            
-        else:
-            print("Running in production, loading models from Hugging Face...")
-            risk_resp = requests.get(CANCELLATION_RISK_MODEL_PATH)
-            self.risk_model = joblib.load(io.BytesIO(risk_resp.content))
-            price_resp = requests.get(PRICE_MODEL_PATH)
-            self.price_model = joblib.load(io.BytesIO(price_resp.content))
+        if not IS_LOCAL:
+            print("Running in production, loading models from Hugging Face (cached locally)...")
+        
+        self.risk_model = model_registry.get('cancel_pipeline')
+        self.price_model = model_registry.get('price_pipeline')
         
         self.lt_map = LEAD_TIME_CONFIG
         self.lt_steps = sorted(LEAD_TIME_CONFIG.values())
-        self.visual_service = VisualService()
+        self.sweep_cache = SweepCache(SWEEP_CACHE_MAX_BYTES)
+        self.stay_grid_cache = SweepCache(STAY_GRID_CACHE_MAX_BYTES)
+        self.sweep_store = SweepStore(SWEEP_STORE_PATH, SWEEP_PROFILE_FEATURES)
+        self.stay_calendar = StayCalendar(CALENDAR_HORIZON_DAYS)
+        self.visual_service = model_registry.get('visual_service')
+        self._compile_models()
+        
+        # Gather rows of concurrent requests into shared model calls
+        self.use_dispatcher = INFERENCE_DISPATCHER_ENABLED
+        self.risk_dispatcher = InferenceDispatcher(self._run_risk_model, INFERENCE_BATCH_WINDOW_MS, INFERENCE_MAX_BATCH_ROWS, 'risk', INFERENCE_DISPATCH_TIMEOUT_S)
+        self.price_dispatcher = InferenceDispatcher(self._run_price_model, INFERENCE_BATCH_WINDOW_MS, INFERENCE_MAX_BATCH_ROWS, 'price', INFERENCE_DISPATCH_TIMEOUT_S)
+    
+    def _compile_models(self):
+        # Turn the fitted ColumnTransformers into lookup tables so requests skip pandas entirely
+        try:
+            self.risk_encoder, self.risk_estimator = CompiledFeatureEncoder.from_pipeline(self.risk_model, BOOKING_FEATURES)
+            self.price_encoder, self.price_estimator = CompiledFeatureEncoder.from_pipeline(self.price_model, BOOKING_FEATURES)
+            
+            if not check_encoder_parity(self.risk_model, self.risk_encoder, self.risk_estimator, 'predict_proba'):
+                raise ValueError("risk model predictions differ from the pipeline")
+            if not check_encoder_parity(self.price_model, self.price_encoder, self.price_estimator, 'predict'):
+                raise ValueError("price model predictions differ from the pipeline")
+        
+        except ValueError as e:
+            print(f"⚠️ Compiled feature encoder disabled, using sklearn pipelines: {e}")
+            self.risk_encoder = self.price_encoder = None
+        
+        self._compile_trees()
+    
+    def _compile_trees(self):
+        # Flattened copies of the LightGBM trees; scripts/check_tree_parity.py verifies them before a model is published
+        self.risk_trees = self.price_trees = self.sweep_cells = None
+        if self.risk_encoder is None:
+            return
+        
+        try:
+            risk_trees = FlatTreeEnsemble.from_lgbm(self.risk_estimator)
+            price_trees = FlatTreeEnsemble.from_lgbm(self.price_estimator)
+        except ValueError as e:
+            print(f"⚠️ NumPy tree evaluator and sweep cells disabled, using LightGBM: {e}")
+            return
+        
+        # Split thresholds of the simulated sweep features, so sweep rows in the same tree cell are scored once
+        self.sweep_cells = TreeCells.from_trees(
+            [(risk_trees, self.risk_encoder.numeric_columns), (price_trees, self.price_encoder.numeric_columns)],
+            SWEEP_FEATURES
+        )
+        if TREE_EVALUATOR != 'lightgbm':
+            self.risk_trees, self.price_trees = risk_trees, price_trees
+    
+    def _use_trees(self, trees, X):
+        # LightGBM has a fixed per-call overhead but scales better on large matrices
+        return trees is not None and (TREE_EVALUATOR == 'numpy' or len(X) <= TREE_EVALUATOR_MAX_ROWS)
+    
+    def _to_frame(self, columns, n_rows):
+        return pd.DataFrame(columns, index=range(n_rows))[BOOKING_FEATURES]
     
-    def get_test_lts(self, user_lt, is_flexible_year=False):
+    def _run_risk_model(self, X):
+        if self.risk_encoder is None:
+            return self.risk_model.predict_proba(X)[:, 1]
+        if self._use_trees(self.risk_trees, X):
+            return self.risk_trees.predict_proba(X)[:, 1]
+        return self.risk_estimator.predict_proba(X)[:, 1]
+    
+    def _run_price_model(self, X):
+        if self.price_encoder is None:
+            return self.price_model.predict(X)
+        if self._use_trees(self.price_trees, X):
+            return self.price_trees.predict(X)
+        return self.price_estimator.predict(X)
+    
+    def predict_risk(self, columns, n_rows=1):
+        with timed_stage("risk_predict"):
+            if self.risk_encoder is None:
+                X = self._to_frame(columns, n_rows)
+            else:
+                X = self.risk_encoder.transform(columns, n_rows)
+            
+            if self.use_dispatcher:
+                return self.risk_dispatcher.submit(X)
+            return self._run_risk_model(X)
+    
+    def predict_price(self, columns, n_rows=1):
+        with timed_stage("price_predict"):
+            if self.price_encoder is None:
+                X = self._to_frame(columns, n_rows)
+            else:
+                X = self.price_encoder.transform(columns, n_rows)
+            
+            if self.use_dispatcher:
+                return self.price_dispatcher.submit(X)
+            return self._run_price_model(X)
+    
+    def get_test_lts(self, user_lt=None, is_flexible_year=False):
         test_lts = set()
 
         test_lts.update(range(1, 31, 1))
@@ -37,7 +131,8 @@ class BookingService:
         if is_flexible_year:
             test_lts.update(range(366, 731, 28))
         
-        test_lts.add(user_lt)
+        if user_lt is not None:
+            test_lts.add(user_lt)
         
         return sorted([lt for lt in test_lts if lt > 0])
     
@@ -45,116 +140,206 @@ class BookingService:
         month_days = pd.date_range(start=f"{year}-{month}-01", periods=pd.Period(f"{year}-{month}").days_in_month)
         return sorted(list(set([d.isocalendar().week for d in month_days])))
     
-    def get_complete_risk_price_report(self, input_data, is_flexible_year=False):
-        now = pd.Timestamp.now().normalize()
+    def _to_feature_record(self, input_data):
+        # Accept either a one-row DataFrame or a plain feature dict
+        if isinstance(input_data, pd.DataFrame):
+            input_data = input_data.iloc[0].to_dict()
         
-        user_lt = int(input_data['lead_time'].iloc[0])
+        return {col: input_data[col].item() if hasattr(input_data[col], 'item') else input_data[col] for col in BOOKING_FEATURES}
+    
+    def _get_profile_key(self, features):
+        # The sweep overwrites lead time, month and week, so only the rest identifies a profile
+        return tuple(features[col] for col in SWEEP_PROFILE_FEATURES)
+    
+    def _to_feature_columns(self, feature_list):
+        # Stack feature records column-wise
+        return {col: np.array([features[col] for features in feature_list]) for col in BOOKING_FEATURES}
+    
+    def _get_sweep_cells(self, profiles, simulated_columns):
+        # Within a profile only the simulated features change, and rows between the same split thresholds
+        # of every tree score the same; returns the row scored for each cell and each row's cell
+        if self.sweep_cells is None:
+            return np.arange(len(profiles)), np.arange(len(profiles))
         
-        test_lts = self.get_test_lts(user_lt, is_flexible_year)
+        cells = self.sweep_cells.get_cells(simulated_columns)
+        _, rows, inverse = np.unique(profiles * (int(cells.max()) + 1) + cells, return_index=True, return_inverse=True)
+        return rows, inverse.reshape(-1)
+    
+    def _score_lead_time_batch(self, feature_list, now, lts_list):
+        # 1. Calculate the simulated arrival dates for every profile and lead time at once
+        counts = [len(test_lts) for test_lts in lts_list]
+        lts = np.concatenate([np.asarray(test_lts, dtype=np.int64) for test_lts in lts_list])
+        simulated_arrivals = now + pd.to_timedelta(lts, unit='D')
+        sim_years = simulated_arrivals.year.to_numpy(dtype=np.int64)
+        sim_months = simulated_arrivals.month.to_numpy(dtype=np.int64)
+        sim_weeks = simulated_arrivals.isocalendar()['week'].to_numpy(dtype=np.int64)
         
-        results = []
-        for lt in test_lts:
-            # 1. Calculate the simulated arrival date based on lead time
-            simulated_arrival = now + pd.Timedelta(days=lt)
-            
-            sim_year = simulated_arrival.year
-            sim_month = simulated_arrival.month
-            sim_week = simulated_arrival.isocalendar().week
-            
-            if not is_flexible_year and lt > 365:
+        # 2. Keep one row per tree cell of every profile, then fill its profile and simulated columns
+        profiles = np.repeat(np.arange(len(counts), dtype=np.int64), counts)
+        simulated_columns = {'lead_time': lts, 'arrival_date_month_num': sim_months, 'arrival_date_week_number': sim_weeks}
+        rows, inverse = self._get_sweep_cells(profiles, simulated_columns)
+        
+        sweep_columns = {col: values[profiles[rows]] for col, values in self._to_feature_columns(feature_list).items()}
+        sweep_columns.update({col: values[rows] for col, values in simulated_columns.items()})
+        
+        # Predict risk and price for all sweeps in one call each, then spread the scores back over the cells' rows
+        probs = self.predict_risk(sweep_columns, len(rows))[inverse]
+        prices = self.predict_price(sweep_columns, len(rows))[inverse]
+        
+        report = pd.DataFrame({
+            'year': sim_years,
+            'month': sim_months,
+            'week_number': sim_weeks,
+            'lt': lts,
+            'risk': probs,
+            'price': prices
+        })
+        
+        bounds = np.cumsum([0] + counts)
+        return [report.iloc[start:end].reset_index(drop=True) for start, end in zip(bounds[:-1], bounds[1:])]
+    
+    def _get_stored_sweeps(self, keys, feature_list, now, grid_lts):
+        # Build sweep tables of precomputed profiles from their curves, over the grid plus the users' lead times
+        user_lts = {}
+        for key, features in zip(keys, feature_list):
+            lts = user_lts.setdefault(key, set(grid_lts))
+            if int(features['lead_time']) > 0:
+                lts.add(int(features['lead_time']))
+        
+        tables = {}
+        for key, lts in user_lts.items():
+            curves = self.sweep_store.get_curves(key, now.date())
+            lts = np.array(sorted(lts), dtype=np.int64)
+            if curves is None or lts[-1] >= len(curves[0]):
                 continue
-
-            temp_df = input_data.copy()
-            temp_df['arrival_date_month_num'] = sim_month
-            temp_df['arrival_date_week_number'] = sim_week
-            temp_df['lead_time'] = lt
-            
-            # Predict risk and price
-            prob = self.risk_model.predict_proba(temp_df)[0][1]
-            price = self.price_model.predict(temp_df)[0]
             
-            results.append({
-                'year': sim_year,
-                'month': sim_month,
-                'week_number': sim_week,
-                'lt': lt,
-                'risk': prob,
-                'price': price
+            risks, prices = curves
+            calendar_table = self.stay_calendar.get_table(int(lts[-1]) + 1)
+            offsets = calendar_table.offset_of(now.date()) + lts
+            tables[key] = pd.DataFrame({
+                'year': calendar_table.years[offsets].astype(np.int64),
+                'month': calendar_table.months[offsets].astype(np.int64),
+                'week_number': calendar_table.iso_weeks[offsets].astype(np.int64),
+                'lt': lts,
+                'risk': risks[lts].astype(np.float64),
+                'price': prices[lts].astype(np.float64),
+                'on_grid': np.isin(lts, grid_lts)
             })
         
-        res_df = pd.DataFrame(results)
+        return tables
+    
+    def _get_cached_sweeps(self, feature_list, now):
+        # Cached tables always hold the flexible-year grid plus every user lead time scored so far
+        day = now.date()
+        grid_lts = self.get_test_lts(is_flexible_year=True)
+        keys = [self._get_profile_key(features) for features in feature_list]
+        stored = self._get_stored_sweeps(keys, feature_list, now, grid_lts)
+        tables = {key: stored[key] if key in stored else self.sweep_cache.get(key, day) for key in dict.fromkeys(keys)}
+        
+        # Collect the lead times each profile still misses, so every sweep is scored in one pass
+        pending = {}
+        for key, features in zip(keys, feature_list):
+            table = tables[key]
+            user_lt = int(features['lead_time'])
+            _, missing_lts = pending.setdefault(key, (features, set(grid_lts) if table is None else set()))
+            
+            if user_lt > 0 and (table is None or not (table['lt'] == user_lt).any()):
+                missing_lts.add(user_lt)
+        
+        pending = {key: item for key, item in pending.items() if item[1]}
+        if pending:
+            scored = self._score_lead_time_batch(
+                [features for features, _ in pending.values()],
+                now,
+                [sorted(missing_lts) for _, missing_lts in pending.values()]
+            )
+            
+            for key, new_rows in zip(pending, scored):
+                new_rows['on_grid'] = new_rows['lt'].isin(grid_lts)
+                table = tables[key]
+                if table is not None:
+                    new_rows = pd.concat([table, new_rows], ignore_index=True).sort_values('lt', ignore_index=True)
+                
+                tables[key] = new_rows
+                self.sweep_cache.put(key, day, new_rows)
+        
+        return [tables[key] for key in keys]
+    
+    def _select_sweep(self, table, user_lt, is_flexible_year=False):
+        mask = table['on_grid'] | (table['lt'] == user_lt)
+        if not is_flexible_year:
+            mask &= table['lt'] <= 365
+        
+        res_df = table.loc[mask, ['year', 'month', 'week_number', 'lt', 'risk', 'price']].reset_index(drop=True)
         
         if res_df.empty:
             return pd.DataFrame(columns=['year', 'month', 'week_number', 'lt', 'risk', 'price'])
             
         return res_df
     
-    def get_advice_by_weight(self, candidates, weight_risk, weight_price):
-        if candidates.empty:
-            return None
+    def precompute_sweeps(self, profiles, now, max_lt):
+        """Risk and price curves of each profile over lead times 0..max_lt (lead time 0 is left as NaN)."""
+        lts = list(range(1, max_lt + 1))
+        scored = self._score_lead_time_batch(profiles, now, [lts] * len(profiles))
         
-        temp_candidates = candidates.copy()
-        temp_candidates['total_score'] = (temp_candidates['risk_norm'] * weight_risk) + (temp_candidates['price_norm'] * weight_price)
+        risks = np.full((len(profiles), max_lt + 1), np.nan)
+        prices = np.full((len(profiles), max_lt + 1), np.nan)
+        for i, table in enumerate(scored):
+            risks[i, 1:] = table['risk'].to_numpy()
+            prices[i, 1:] = table['price'].to_numpy()
         
-        advice = temp_candidates.sort_values('total_score').iloc[0]
-        
-        return advice
+        return risks, prices
     
-    def _get_date_match_from_week(self, advice, target_weekend, target_week):
-        if advice is None: return None
-        
+    def get_complete_risk_price_report(self, input_data, is_flexible_year=False):
         now = pd.Timestamp.now().normalize()
+        features = self._to_feature_record(input_data)
         
-        advice_data = advice.to_dict() if hasattr(advice, 'to_dict') else advice
-        year = int(advice_data['year'])
-        month = int(advice_data['month'])
-        week = int(advice_data['week_number'])
+        table = self._get_cached_sweeps([features], now)[0]
         
-        start_of_week = pd.to_datetime(f'{year}-W{week}-1', format='%G-W%V-%u')
-        total_nights = target_weekend + target_week
+        return self._select_sweep(table, int(features['lead_time']), is_flexible_year)
+    
+    def get_advice_by_weight(self, candidates, weight_risk, weight_price):
+        return ParetoFrontier(candidates).best(weight_risk, weight_price)
+    
+    def _get_date_matches(self, advices, target_weekend, target_week):
+        # Resolve check-in dates of several advice rows with one calendar lookup
+        advice_list = [advice.to_dict() if hasattr(advice, 'to_dict') else advice for advice in advices if advice is not None]
+        matches = iter(self.stay_calendar.match_check_ins(
+            [int(advice['year']) for advice in advice_list],
+            [int(advice['month']) for advice in advice_list],
+            [int(advice['week_number']) for advice in advice_list],
+            target_weekend,
+            target_week
+        ))
+        advice_iter = iter(advice_list)
         
-        for i in range(7):
-            candidate_start = start_of_week + pd.Timedelta(days=i)
-            
-            if candidate_start < now or candidate_start.month != month:
+        results = []
+        for advice in advices:
+            if advice is None:
+                results.append(None)
                 continue
             
-            stay_range = pd.date_range(start=candidate_start, periods=total_nights)
-            
-            current_weekend = len([d for d in stay_range if d.weekday() in [4, 5]])
-            current_week = total_nights - current_weekend
-            
-            if current_weekend == target_weekend and current_week == target_week:
-                return {
-                    **advice_data,
-                    "check_in": stay_range[0].strftime('%Y-%m-%d'),
-                    "check_out": (stay_range[-1] + pd.Timedelta(days=1)).strftime('%Y-%m-%d'),
-                    "stay_dates": [d.strftime('%Y-%m-%d') for d in stay_range]
-                }
-        
-        # Fallback: If cannot match, return Friday of the week as start date
-        for i in range(7):
-            fallback_start = start_of_week + pd.Timedelta(days=i)
-            if fallback_start >= now and fallback_start.month == month:
-                stay_range = pd.date_range(start=fallback_start, periods=total_nights)
-                return {
-                    **advice_data,
-                    "check_in": fallback_start.strftime('%Y-%m-%d'),
-                    "check_out": (stay_range[-1] + pd.Timedelta(days=1)).strftime('%Y-%m-%d'),
-                    "stay_dates": [] 
-                }
+            check_in, check_out, stay_dates = next(matches)
+            results.append({
+                **next(advice_iter),
+                "check_in": check_in,
+                "check_out": check_out,
+                "stay_dates": stay_dates
+            })
         
-        return {
-            **advice_data,
-            "check_in": fallback_start.strftime('%Y-%m-%d'),
-            "check_out": (fallback_start + pd.Timedelta(days=total_nights)).strftime('%Y-%m-%d'),
-            "stay_dates": [] 
-        }
+        return results
+    
+    def _get_date_match_from_week(self, advice, target_weekend, target_week):
+        return self._get_date_matches([advice], target_weekend, target_week)[0]
     
     def get_stategic_advice(self, input_data, w_risk, w_price, is_flexible_year=False):
-        res_df = self.get_complete_risk_price_report(input_data, is_flexible_year)
-        user_lt = input_data['lead_time'].iloc[0]
-        user_month = input_data['arrival_date_month_num'].iloc[0]
+        features = self._to_feature_record(input_data)
+        res_df = self.get_complete_risk_price_report(features, is_flexible_year)
+        
+        return self._build_stategic_advice(features, res_df, w_risk, w_price, is_flexible_year)
+    
+    def _build_advice_frontiers(self, features, res_df):
+        user_month = features['arrival_date_month_num']
         
         # normalization
         risk_min, risk_max = res_df['risk'].min(), res_df['risk'].max()
@@ -162,22 +347,26 @@ class BookingService:
         
         price_min, price_max = res_df['price'].min(), res_df['price'].max()
         res_df['price_norm'] = (res_df['price'] - price_min) / (price_max - price_min)
-            
+        
+        # 1. Best CP value in an year / 2. Same month / 3. Same or longer lead time
+        future_months = [(int(user_month) + i - 1) % 12 + 1 for i in range(0, 3)]
+        
+        return {
+            'cp': ParetoFrontier(res_df, res_df['lt'] <= 365),
+            'this_year': ParetoFrontier(res_df, (res_df['month'] == user_month) & (res_df['lt'] <= 365)),
+            'next_year': ParetoFrontier(res_df, (res_df['month'] == user_month) & (res_df['lt'] > 365)),
+            'lt': ParetoFrontier(res_df, res_df['month'].isin(future_months))
+        }
+    
+    def _pick_advices(self, frontiers, w_risk, w_price, is_flexible_year=False):
         # 1. Best CP value in an year
-        cp_advice = self.get_advice_by_weight(res_df[res_df['lt'] <= 365], w_risk, w_price)
-        cp_advice = self._get_date_match_from_week(
-            cp_advice,
-            input_data['stays_in_weekend_nights'].iloc[0], input_data['stays_in_week_nights'].iloc[0]
-        )
+        cp_advice = frontiers['cp'].best(w_risk, w_price)
         
         # 2. Same month
-        this_year_options = res_df[(res_df['month'] == user_month) & (res_df['lt'] <= 365)]
-        next_year_options = res_df[(res_df['month'] == user_month) & (res_df['lt'] > 365)]
-        
-        best_this_year = self.get_advice_by_weight(this_year_options, w_risk, w_price)
+        best_this_year = frontiers['this_year'].best(w_risk, w_price)
         
-        if is_flexible_year and not next_year_options.empty:
-            best_next_year = self.get_advice_by_weight(next_year_options, w_risk, w_price)
+        if is_flexible_year and not frontiers['next_year'].empty:
+            best_next_year = frontiers['next_year'].best(w_risk, w_price)
             
             price_saving_ratio = (best_this_year['price'] - best_next_year['price']) / best_this_year['price']
             
@@ -191,29 +380,66 @@ class BookingService:
             month_advice = best_this_year
             month_advice['is_next_year'] = False
         
-        month_advice = self._get_date_match_from_week(
-            month_advice,
-            input_data['stays_in_weekend_nights'].iloc[0], input_data['stays_in_week_nights'].iloc[0]
-        )
-        
         # 3. Same or longer lead time
-        future_months = [(int(user_month) + i - 1) % 12 + 1 for i in range(0, 3)]
-        lt_candidates = res_df[(res_df['month'].isin(future_months))].copy()
-        
-        # if cp_advice is not None:
-        #     lt_candidates = lt_candidates[
-        #         ~((lt_candidates['month'] == cp_advice['month']) &
-        #           (lt_candidates['lt'] == cp_advice['lt']))
-        #     ]
-        
-        lt_advice = self.get_advice_by_weight(lt_candidates, w_risk, w_price)
-        lt_advice = self._get_date_match_from_week(
-            lt_advice,
-            input_data['stays_in_weekend_nights'].iloc[0], input_data['stays_in_week_nights'].iloc[0]
+        lt_advice = frontiers['lt'].best(w_risk, w_price)
+        
+        return cp_advice, month_advice, lt_advice
+    
+    def _select_advices(self, features, res_df, w_risk, w_price, is_flexible_year=False):
+        frontiers = self._build_advice_frontiers(features, res_df)
+        return self._pick_advices(frontiers, w_risk, w_price, is_flexible_year)
+    
+    def _build_weighted_advices(self, features, res_df, weight_options, is_flexible_year=False):
+        # Frontiers are built once, each weight pair only walks them
+        frontiers = self._build_advice_frontiers(features, res_df)
+        picks = [self._pick_advices(frontiers, option['w_risk'], option['w_price'], is_flexible_year) for option in weight_options]
+        
+        # Match check-in dates of every pick at once
+        matches = self._get_date_matches(
+            [advice for advices in picks for advice in advices],
+            features['stays_in_weekend_nights'], features['stays_in_week_nights']
         )
         
+        return [
+            {
+                **option,
+                "recommendations": {
+                    "best_cp": matches[i * 3],
+                    "month_priority": matches[i * 3 + 1],
+                    "lt_priority": matches[i * 3 + 2]
+                }
+            }
+            for i, option in enumerate(weight_options)
+        ]
+    
+    def get_weight_options(self, user_input):
+        # Explicit presets first, then the evenly spaced risk shares of a slider
+        options = [dict(preset) for preset in user_input.get('weight_presets') or []]
+        
+        slider = user_input.get('weight_slider')
+        if slider:
+            steps = slider['steps']
+            for i in range(steps):
+                risk_share = round(i / (steps - 1), 6)
+                options.append({'label': None, 'w_risk': risk_share, 'w_price': round(1 - risk_share, 6)})
+        
+        return options
+    
+    def _build_stategic_advice(self, features, res_df, w_risk, w_price, is_flexible_year=False, include_chart=True):
+        with timed_stage("advice"):
+            cp_advice, month_advice, lt_advice = self._select_advices(features, res_df, w_risk, w_price, is_flexible_year)
+            
+            # Match check-in dates of all three advices at once
+            cp_advice, month_advice, lt_advice = self._get_date_matches(
+                [cp_advice, month_advice, lt_advice],
+                features['stays_in_weekend_nights'], features['stays_in_week_nights']
+            )
+        
         # Plot bubble chart
-        bubble_chart = self.visual_service.plot_bubble_recommendation(res_df, cp_advice, lt_advice, month_advice)
+        bubble_chart = None
+        if include_chart:
+            with timed_stage("charts"):
+                bubble_chart = self.visual_service.plot_bubble_recommendation(res_df, cp_advice, lt_advice, month_advice)
         
         return cp_advice, month_advice, lt_advice, bubble_chart
     
@@ -237,8 +463,8 @@ class BookingService:
         
         return w_risk, w_price
     
-    def get_ai_insight(self, predicted_price, country_iso, month):
-        context, avg_base = self.visual_service.get_price_baseline(country_iso, month)
+    def get_ai_insight(self, predicted_price, country_iso, month, baseline=None):
+        context, avg_base = baseline or self.visual_service.get_price_baseline(country_iso, month)
         
         diff_ratio = (predicted_price - avg_base) / avg_base
         diff_pct = abs(int(diff_ratio * 100))
@@ -261,43 +487,91 @@ class BookingService:
                 "message": f"The price is within a **reasonable range**. Our AI prediction is consistent with typical market rates {context.lower()}."
             }
     
+    def build_booking_features(self, user_input, country_iso=None):
+        weekend_nights, week_nights = self.stay_calendar.get_stay_distribution(user_input['arrival_date'], user_input['leave_date'])
+        
+        features = {
+            **self.build_profile_features(user_input, country_iso),
+            'lead_time': calculate_lead_time(user_input['arrival_date']),
+            'arrival_date_month_num': get_month(user_input['arrival_date']),
+            'arrival_date_week_number': int(pd.Timestamp(user_input['arrival_date']).isocalendar().week),
+            'stays_in_weekend_nights': weekend_nights,
+            'stays_in_week_nights': week_nights
+        }
+        
+        return {col: features[col] for col in BOOKING_FEATURES}
+    
+    def build_profile_features(self, user_input, country_iso=None):
+        # Booking features that don't depend on the travel dates
+        companion = user_input['companion']
+        if country_iso is None:
+            country_iso = get_country_iso_code(user_input['country_name'])
+        
+        return {
+            'hotel': user_input['hotel'],
+            'adults': companion.get('adults', 0) + companion.get('seniors', 0),
+            'children': companion.get('children', 0),
+            'babies': companion.get('babies', 0),
+            'country': country_iso,
+            'market_segment': 'Online TA', # Default
+            'deposit_type': 'No Deposit', # Default
+            'customer_type': determine_customer_type(companion),
+            'required_car_parking_spaces': 0,
+            'total_of_special_requests': 0
+        }
+    
     def get_hotel_booking_strategy(self, user_input):
-        w_risk, w_price = self.get_risk_price_weight(user_input['companion'])
-        is_flexible_year = user_input['is_flexible_year']
+        return self.get_hotel_booking_strategies([user_input])[0]
+    
+    def _score_profiles(self, user_inputs):
+        now = pd.Timestamp.now().normalize()
         
         # Format data for predicting risk
-        current_input = pd.DataFrame([user_input]) if isinstance(user_input, dict) else user_input.copy()
-        current_input['lead_time'] = calculate_lead_time(user_input['arrival_date'])
-        current_input['arrival_date_month_num'] = get_month(user_input['arrival_date'])
-        current_input['arrival_date_week_number'] = pd.to_datetime(user_input['arrival_date']).isocalendar().week
-        current_input['stays_in_weekend_nights'], current_input['stays_in_week_nights'] = calculate_stay_distribution(user_input['arrival_date'], user_input['leave_date'])
-        current_input['adults'] = user_input['companion'].get('adults', 0) + user_input['companion'].get('seniors', 0)
-        current_input['children'] = user_input['companion'].get('children', 0)
-        current_input['babies'] = user_input['companion'].get('babies', 0)
-        current_input['country'] = get_country_iso_code(user_input['country_name'])
-        current_input['market_segment'] = 'Online TA' # Default
-        current_input['deposit_type'] = 'No Deposit' # Default
-        current_input['customer_type'] = determine_customer_type(
-            user_input['companion']
+        with timed_stage("feature_build"):
+            country_isos = get_country_iso_codes([user_input['country_name'] for user_input in user_inputs])
+            feature_list = [self.build_booking_features(user_input, country_iso) for user_input, country_iso in zip(user_inputs, country_isos)]
+            current_columns = self._to_feature_columns(feature_list)
+        if BOOKING_PROFILE_LOG_PATH:
+            append_profile_log(BOOKING_PROFILE_LOG_PATH, [{col: features[col] for col in SWEEP_PROFILE_FEATURES} for features in feature_list])
+        
+        # Predict current risk and adr of every profile at once
+        user_probs = self.predict_risk(current_columns, len(feature_list))
+        prices_predicted = self.predict_price(current_columns, len(feature_list))
+        
+        # Score the lead-time sweeps of every profile at once (includes their risk/price predicts)
+        with timed_stage("sweep"):
+            sweep_tables = self._get_cached_sweeps(feature_list, now)
+        
+        # Resolve the price baselines of every profile at once
+        baseline_contexts, baseline_values = self.visual_service.get_price_baselines(
+            current_columns['country'], current_columns['arrival_date_month_num']
         )
-        current_input['required_car_parking_spaces'] = 0
-        current_input['total_of_special_requests'] = 0
-        current_input = current_input[BOOKING_FEATURES]
         
-        # Plot risk donut chart
-        user_prob = float(self.risk_model.predict_proba(current_input)[0][1])
-        donut_chart = self.visual_service.draw_risk_donut(user_prob)
+        return zip(feature_list, user_probs, prices_predicted, sweep_tables, zip(baseline_contexts, baseline_values))
+    
+    def _build_strategy(self, user_input, current_input, user_prob, price_predicted, sweep_table, baseline, include_donut=True, include_bubble=True):
+        w_risk, w_price = self.get_risk_price_weight(user_input['companion'])
+        is_flexible_year = user_input['is_flexible_year']
+        user_prob = float(user_prob)
+        price_predicted = int(price_predicted)
         
-        # Predict adr
-        price_predicted = int(self.price_model.predict(current_input)[0])
+        # Plot risk donut chart
+        donut_chart = None
+        if include_donut:
+            with timed_stage("charts"):
+                donut_chart = self.visual_service.draw_risk_donut(user_prob)
         
         # Get current AI insight
-        ai_insight = self.get_ai_insight(price_predicted, current_input['country'].iloc[0], current_input['arrival_date_month_num'].iloc[0])
+        ai_insight = self.get_ai_insight(price_predicted, current_input['country'], current_input['arrival_date_month_num'], baseline)
         
         # Get advices
-        cp_advice, month_advice, lt_advice, bubble_chart = self.get_stategic_advice(current_input, w_risk, w_price, is_flexible_year)
+        with timed_stage("advice"):
+            res_df = self._select_sweep(sweep_table, int(current_input['lead_time']), is_flexible_year)
+        cp_advice, month_advice, lt_advice, bubble_chart = self._build_stategic_advice(
+            current_input, res_df, w_risk, w_price, is_flexible_year, include_bubble
+        )
         
-        return {
+        strategy = {
             "donut_chart": donut_chart,
             "current_risk": user_prob,
             "current_adr": price_predicted,
@@ -309,23 +583,160 @@ class BookingService:
             },
             "bubble_chart": bubble_chart
         }
+        
+        # Advice for extra weight pairs reuses the scored sweep, so a risk/price slider needs no new inference
+        weight_options = self.get_weight_options(user_input)
+        if weight_options:
+            with timed_stage("advice"):
+                strategy["weighted_advices"] = self._build_weighted_advices(current_input, res_df, weight_options, is_flexible_year)
+        
+        return strategy, res_df
+    
+    def get_hotel_booking_strategies(self, user_inputs):
+        strategies = []
+        for user_input, profile in zip(user_inputs, self._score_profiles(user_inputs)):
+            include_charts = user_input.get('include_charts', True)
+            strategy, _ = self._build_strategy(user_input, *profile, include_donut=include_charts, include_bubble=include_charts)
+            strategies.append(strategy)
+        
+        return strategies
+    
+    def get_hotel_comparison(self, user_input):
+        # Both hotel types are scored as one batch: current rows and lead-time sweeps share each model call
+        user_inputs = [{**user_input, 'hotel': hotel} for hotel in HOTEL_TYPES]
+        include_charts = user_input.get('include_charts', True)
+        
+        strategies = {}
+        chart_inputs = []
+        for hotel_input, profile in zip(user_inputs, self._score_profiles(user_inputs)):
+            strategy, res_df = self._build_strategy(hotel_input, *profile, include_donut=include_charts, include_bubble=False)
+            strategy.pop("bubble_chart")
+            strategies[hotel_input['hotel']] = strategy
+            chart_inputs.append((hotel_input['hotel'], res_df, strategy['recommendations']))
+        
+        # One bubble chart with the options and advices of both hotel types
+        bubble_chart = None
+        if include_charts:
+            with timed_stage("charts"):
+                bubble_chart = self.visual_service.plot_bubble_comparison(chart_inputs)
+        
+        return {
+            "strategies": strategies,
+            "bubble_chart": bubble_chart
+        }
+    
+    def _score_stay_grid(self, profile, calendar_table, lts, nights, weekend_nights):
+        # One row per (arrival day, stay length), scored in one call per model
+        n_rows = weekend_nights.size
+        columns = {col: np.repeat(np.array([profile[col]]), n_rows) for col in STAY_GRID_PROFILE_FEATURES}
+        columns['lead_time'] = np.repeat(lts, len(nights))
+        columns['arrival_date_month_num'] = np.repeat(calendar_table.months[lts].astype(np.int64), len(nights))
+        columns['arrival_date_week_number'] = np.repeat(calendar_table.iso_weeks[lts], len(nights))
+        columns['stays_in_weekend_nights'] = weekend_nights.ravel()
+        columns['stays_in_week_nights'] = (nights - weekend_nights).ravel()
+        
+        probs = self.predict_risk(columns, n_rows)
+        prices = self.predict_price(columns, n_rows)
+        
+        # [adr, risk] x arrival day x stay length
+        return np.stack([prices, probs]).astype(np.float32).reshape(2, *weekend_nights.shape)
+    
+    def get_stay_grid(self, user_input):
+        """ADR and cancellation risk of every arrival day in the next STAY_GRID_DAYS days x stays of 1..STAY_GRID_MAX_NIGHTS nights."""
+        day = pd.Timestamp.now().normalize().date()
+        profile = self.build_profile_features(user_input)
+        key = tuple(profile[col] for col in STAY_GRID_PROFILE_FEATURES)
+        
+        # Arrivals start tomorrow, like the lead times of the sweeps
+        calendar_table, lts, nights, weekend_nights = self.stay_calendar.get_stay_grid(1, STAY_GRID_DAYS, STAY_GRID_MAX_NIGHTS)
+        grid = self.stay_grid_cache.get(key, day)
+        if grid is None:
+            with timed_stage("stay_grid"):
+                grid = self._score_stay_grid(profile, calendar_table, lts, nights, weekend_nights)
+            self.stay_grid_cache.put(key, day, grid)
+        
+        return {
+            "start_date": calendar_table.date_strings[lts[0]],
+            "end_date": calendar_table.date_strings[lts[-1]],
+            "nights": nights.tolist(),
+            # Typed arrays (float32, shape days x nights), the same encoding as the chart data
+            "adr": to_typed_array(grid[0], np.float32),
+            "risk": to_typed_array(grid[1], np.float32)
+        }
+    
+    def get_cache_stats(self):
+        return {
+            **self.sweep_cache.get_stats(),
+            "store": self.sweep_store.get_stats(),
+            "stay_grid": self.stay_grid_cache.get_stats()
+        }
+    
+    def get_dispatcher_stats(self):
+        return {
+            "enabled": self.use_dispatcher,
+            "risk": self.risk_dispatcher.get_stats(),
+            "price": self.price_dispatcher.get_stats()
+        }
     
 class VisualService:
+    # Marker style of each advice, in cp / lt / month order
+    ADVICE_STYLES = [
+        {'label': '🌟 Best CP Value', 'color': 'gold', 'symbol': 'star'},
+        {'label': '🛡️ Planning Priority', 'color': 'royalblue', 'symbol': 'diamond'},
+        {'label': '📅 Month Priority', 'color': 'forestgreen', 'symbol': 'square'}
+    ]
+    ADVICE_OFFSETS = [
+        {'ay': -50, 'ax': 0},
+        {'ay': 0, 'ax': 90},
+        {'ay': 50, 'ax': 0},
+    ]
+    # Color of the options of each hotel type in the comparison chart
+    HOTEL_COLORS = {'City Hotel': 'lightslategrey', 'Resort Hotel': 'lightsalmon'}
+    BASELINE_COUNTRY_CONTEXT = 'Compare to travelers from your country'
+    BASELINE_GLOBAL_CONTEXT = 'Based on general market trends for this month'
+    
     def __init__(self):
-        self.country_monthly_stats = pd.read_csv(COUNTRY_MONTHLY_STATS_PATH)
-        self.country_monthly_stats = self.country_monthly_stats.rename(
+        self.country_monthly_stats = model_registry.get('country_monthly_stats').rename(
             columns={'arrival_date_month_num': 'month'}
         )
+        self._build_price_baseline_index()
+        self._build_figure_templates()
     
-    def draw_risk_donut(self, cancel_prob: float):
-        risk_percent = cancel_prob * 100
+    def _build_figure_templates(self):
+        # Render each figure once with placeholder values; requests only patch the data into copies
+        # of these plain dicts. The large layout templates are shared read-only between responses.
+        self._donut_template = self._build_risk_donut_figure(0.5)
         
-        if risk_percent >= 70:
-            risk_color = '#dc3545'
-        elif risk_percent >= 30:
-            risk_color = '#ffc107'
-        else:
-            risk_color = '#28a745'
+        placeholder_df = pd.DataFrame({'month': [1, 2], 'lt': [1, 2], 'price': [1.0, 2.0], 'risk': [0.1, 0.2]})
+        placeholder_advice = {'month': 1, 'lt': 1, 'price': 1.0}
+        bubble = self._build_bubble_figure(
+            placeholder_df,
+            {**placeholder_advice, 'risk': 0.3},
+            {**placeholder_advice, 'risk': 0.2},
+            {**placeholder_advice, 'risk': 0.1}
+        )
+        
+        layout = bubble['layout']
+        self._bubble_template = {
+            'others': bubble['data'][0],
+            'advice_traces': {trace['name']: trace for trace in bubble['data'][1:]},
+            'advice_annotations': {
+                style['label']: annotation
+                for annotation in layout['annotations'][:-1]
+                for style in self.ADVICE_STYLES if annotation['bordercolor'] == style['color']
+            },
+            'average_annotation': layout['annotations'][-1],
+            'green_rect': layout['shapes'][0],
+            'average_line': layout['shapes'][1],
+            'layout': layout
+        }
+    
+    def _to_plotly_array(self, values):
+        return to_typed_array(values)
+    
+    def _build_risk_donut_figure(self, cancel_prob: float):
+        risk_percent = cancel_prob * 100
+        risk_color = self._get_risk_color(risk_percent)
             
         values = [risk_percent, 100 - risk_percent]
         colors = [risk_color, '#e9ecef']
@@ -361,20 +772,205 @@ class VisualService:
         
         return json.loads(pio.to_json(fig))
     
+    def _get_risk_color(self, risk_percent):
+        if risk_percent >= 70:
+            return '#dc3545'
+        elif risk_percent >= 30:
+            return '#ffc107'
+        return '#28a745'
+    
+    def draw_risk_donut(self, cancel_prob: float):
+        risk_percent = cancel_prob * 100
+        risk_color = self._get_risk_color(risk_percent)
+        
+        trace = self._donut_template['data'][0]
+        layout = self._donut_template['layout']
+        annotation = layout['annotations'][0]
+        
+        return {
+            'data': [{
+                **trace,
+                'marker': {**trace['marker'], 'colors': [risk_color, '#e9ecef']},
+                'values': [risk_percent, 100 - risk_percent]
+            }],
+            'layout': {
+                **layout,
+                'annotations': [{
+                    **annotation,
+                    'font': {**annotation['font'], 'color': risk_color},
+                    'text': f'<b>{risk_percent:.1f}%</b>'
+                }]
+            }
+        }
+    
+    def _build_price_baseline_index(self):
+        stats = self.country_monthly_stats
+        
+        # Dense country x month table of avg_adr, NaN where a cell has 10 or fewer bookings
+        first_rows = stats.drop_duplicates(subset=['country', 'month'], keep='first')
+        first_rows = first_rows[first_rows['month'].between(1, 12)]
+        countries = first_rows['country'].unique()
+        self.baseline_country_index = {country: i for i, country in enumerate(countries)}
+        
+        self.country_baselines = np.full((len(countries), 12), np.nan)
+        reliable = first_rows[first_rows['count'] > 10]
+        rows = reliable['country'].map(self.baseline_country_index).to_numpy(dtype=np.int64)
+        self.country_baselines[rows, reliable['month'].to_numpy(dtype=np.int64) - 1] = reliable['avg_adr'].to_numpy()
+        
+        # When there's no specific country data, fall back to the global average of the month
+        self.global_baselines = np.array([stats[stats['month'] == month]['avg_adr'].mean() for month in range(1, 13)])
+    
     def get_price_baseline(self, country_iso, month):
-        row = self.country_monthly_stats[
-            (self.country_monthly_stats['country'] == country_iso) & 
-            (self.country_monthly_stats['month'] == month)
-        ]
+        if 1 <= month <= 12:
+            row = self.baseline_country_index.get(country_iso)
+            if row is not None and not np.isnan(self.country_baselines[row, month - 1]):
+                return self.BASELINE_COUNTRY_CONTEXT, self.country_baselines[row, month - 1]
+            
+            return self.BASELINE_GLOBAL_CONTEXT, self.global_baselines[month - 1]
         
-        if not row.empty and row['count'].iloc[0] > 10:
-            return 'Compare to travelers from your country', row['avg_adr'].iloc[0]
+        return self.BASELINE_GLOBAL_CONTEXT, np.float64(np.nan)
+    
+    def get_price_baselines(self, country_isos, months):
+        """Vectorized get_price_baseline for many (country, month) pairs; returns (contexts, baselines)."""
+        months = np.asarray(months, dtype=np.int64)
+        rows = np.array([self.baseline_country_index.get(country, -1) for country in country_isos], dtype=np.int64)
+        valid_month = (months >= 1) & (months <= 12)
+        month_idx = np.where(valid_month, months - 1, 0)
         
-        # When there's no specific country data, return global average
-        global_avg = self.country_monthly_stats[self.country_monthly_stats['month'] == month]['avg_adr'].mean()
-        return 'Based on general market trends for this month', global_avg
+        country_values = np.where(
+            (rows >= 0) & valid_month,
+            self.country_baselines[np.maximum(rows, 0), month_idx] if len(self.country_baselines) else np.nan,
+            np.nan
+        )
+        global_values = np.where(valid_month, self.global_baselines[month_idx], np.nan)
+        use_country = ~np.isnan(country_values)
+        
+        contexts = np.where(use_country, self.BASELINE_COUNTRY_CONTEXT, self.BASELINE_GLOBAL_CONTEXT).tolist()
+        return contexts, np.where(use_country, country_values, global_values)
+    
+    def _collect_advices(self, cp_advice, lt_advice, month_advice):
+        advices = [
+            {'data': advice, **style}
+            for advice, style in zip([cp_advice, lt_advice, month_advice], self.ADVICE_STYLES)
+            if advice is not None
+        ]
+        advices.sort(key=lambda x: x['data']['risk'], reverse=True)
+        
+        return advices
     
     def plot_bubble_recommendation(self, res_df, cp_advice, lt_advice, month_advice):
+        template = self._bubble_template
+        price_mean = float(res_df['price'].mean())
+        
+        data = [{
+            **template['others'],
+            'text': [f"Month: {m}<br>Lead time: {lt}<br>Price: ${p:.1f}"
+                for m, lt, p in zip(res_df['month'], res_df['lt'], res_df['price'])],
+            'x': self._to_plotly_array(res_df['price']),
+            'y': self._to_plotly_array(res_df['risk']*100)
+        }]
+        annotations = []
+        
+        for i, adv_item in enumerate(self._collect_advices(cp_advice, lt_advice, month_advice)):
+            advice = adv_item['data']
+            label = adv_item['label']
+            color = adv_item['color']
+            month_name = calendar.month_abbr[int(advice['month'])]
+            
+            offset = self.ADVICE_OFFSETS[i] if i < len(self.ADVICE_OFFSETS) else {'ay': 40, 'ax': 40}
+            
+            data.append({
+                **template['advice_traces'][label],
+                'x': [advice['price']],
+                'y': [advice['risk']*100]
+            })
+            
+            annotations.append({
+                **template['advice_annotations'][label],
+                'ax': offset['ax'],
+                'ay': offset['ay'],
+                'text': f"<span style='color:{color}'><b>{label}</b></span><br>{month_name} / {int(advice['lt'])} days prep",
+                'x': advice['price'],
+                'y': advice['risk']*100
+            })
+        
+        annotations.append({**template['average_annotation'], 'x': price_mean})
+        
+        return {
+            'data': data,
+            'layout': {
+                **template['layout'],
+                'annotations': annotations,
+                'shapes': [
+                    {**template['green_rect'], 'x0': float(res_df['price'].min()), 'x1': price_mean},
+                    {**template['average_line'], 'x0': price_mean, 'x1': price_mean}
+                ]
+            }
+        }
+    
+    def plot_bubble_comparison(self, hotel_advices):
+        """One bubble chart of several hotel types; hotel_advices is a list of (hotel, res_df, recommendations)."""
+        template = self._bubble_template
+        prices = pd.concat([res_df['price'] for _, res_df, _ in hotel_advices])
+        price_mean = float(prices.mean())
+        
+        data = []
+        annotations = []
+        for h, (hotel, res_df, recommendations) in enumerate(hotel_advices):
+            color = self.HOTEL_COLORS.get(hotel, template['others']['marker']['color'])
+            data.append({
+                **template['others'],
+                'name': hotel,
+                'marker': {**template['others']['marker'], 'color': color},
+                'text': [f"{hotel}<br>Month: {m}<br>Lead time: {lt}<br>Price: ${p:.1f}"
+                    for m, lt, p in zip(res_df['month'], res_df['lt'], res_df['price'])],
+                'x': self._to_plotly_array(res_df['price']),
+                'y': self._to_plotly_array(res_df['risk']*100)
+            })
+            
+            advices = self._collect_advices(recommendations['best_cp'], recommendations['lt_priority'], recommendations['month_priority'])
+            for i, adv_item in enumerate(advices):
+                advice = adv_item['data']
+                label = adv_item['label']
+                month_name = calendar.month_abbr[int(advice['month'])]
+                
+                # Mirror the callouts of every other hotel so the two sets don't overlap
+                offset = self.ADVICE_OFFSETS[i] if i < len(self.ADVICE_OFFSETS) else {'ay': 40, 'ax': 40}
+                sign = -1 if h % 2 else 1
+                
+                trace = template['advice_traces'][label]
+                data.append({
+                    **trace,
+                    'name': f"{label} ({hotel})",
+                    'marker': {**trace['marker'], 'line': {**trace['marker'].get('line', {}), 'color': color}},
+                    'x': [advice['price']],
+                    'y': [advice['risk']*100]
+                })
+                
+                annotations.append({
+                    **template['advice_annotations'][label],
+                    'ax': sign * offset['ax'],
+                    'ay': sign * offset['ay'],
+                    'text': f"<span style='color:{adv_item['color']}'><b>{label}</b></span><br>{hotel}: {month_name} / {int(advice['lt'])} days prep",
+                    'x': advice['price'],
+                    'y': advice['risk']*100
+                })
+        
+        annotations.append({**template['average_annotation'], 'x': price_mean})
+        
+        return {
+            'data': data,
+            'layout': {
+                **template['layout'],
+                'annotations': annotations,
+                'shapes': [
+                    {**template['green_rect'], 'x0': float(prices.min()), 'x1': price_mean},
+                    {**template['average_line'], 'x0': price_mean, 'x1': price_mean}
+                ]
+            }
+        }
+    
+    def _build_bubble_figure(self, res_df, cp_advice, lt_advice, month_advice):
         fig = go.Figure()
         
         # Draw all the points
@@ -389,28 +985,9 @@ class VisualService:
                 for m, lt, p in zip(res_df['month'], res_df['lt'], res_df['price'])]
         ))
         
-        advices = []
-        if cp_advice is not None: advices.append({'data': cp_advice,
-                                                'label': '🌟 Best CP Value',
-                                                'color': 'gold',
-                                                'symbol': 'star'})
-        if lt_advice is not None: advices.append({'data': lt_advice,
-                                                'label': '🛡️ Planning Priority',
-                                                'color': 'royalblue',
-                                                'symbol': 'diamond'})
-        if month_advice is not None: advices.append({'data': month_advice,
-                                                'label': '📅 Month Priority',
-                                                'color': 'forestgreen',
-                                                'symbol': 'square'})
-        advices.sort(key=lambda x: x['data']['risk'], reverse=True)
-        
-        offsets = [
-            {'ay': -50, 'ax': 0},
-            {'ay': 0, 'ax': 90},
-            {'ay': 50, 'ax': 0},
-        ]
+        offsets = self.ADVICE_OFFSETS
         
-        for i, adv_item in enumerate(advices):
+        for i, adv_item in enumerate(self._collect_advices(cp_advice, lt_advice, month_advice)):
             advice = adv_item['data']
             label = adv_item['label']
             color = adv_item['color']
@@ -1,105 +1,240 @@
-import joblib
+import threading
 import pandas as pd
 import numpy as np
-import requests
-import io
-from ml_logic.config import THEME_MODEL_PATH, THEME_PREPROCESSOR_PATH, THEME_LE_PATH, CITY_MODEL_PATH, CITY_SCALER_PATH, CITY_DATA_PATH, THEME_FEATURES, BUDGET_MAP, CITY_FEATURES, WEIGHT_CONFIG, CLIMATE_MODES, IS_LOCAL
-from ml_logic.processors.geo_tools import get_city_climate_calendar
+from ml_logic.config import THEME_FEATURES, BUDGET_MAP, CITY_FEATURES, CITY_NEIGHBORS, CITY_INDEX_BRUTE_MAX_SIZE, THEME_TABLE_CHECK_SAMPLES, WEIGHT_CONFIG, CLIMATE_MODES, IS_LOCAL
+from ml_logic.processors.geo_tools import parse_monthly_temps, get_climate_codes, build_climate_calendar
 from ml_logic.processors.data_utils import classify_travel_companion
+from ml_logic.processors.city_index import RegionCityIndex, to_unit_vectors
+from ml_logic.processors.theme_table import TABLE_CATEGORIES
+from ml_logic.model_registry import model_registry
+
+def build_ideal_vector(theme):
+    vec = np.zeros(len(CITY_FEATURES))
+    theme_weights = WEIGHT_CONFIG.get(theme, {})
+    
+    for i, feat in enumerate(CITY_FEATURES):
+        if feat in theme_weights:
+            vec[i] = theme_weights[feat] * 10
+    
+    return vec
+
+class CityIndex:
+    """
+    The city model and dataset with everything derived from them: parsed city arrays, the region index
+    and the neighbors of every theme. It is built whole and then published in one assignment, so a
+    request sees either the old index or the new one, never a mix.
+    """
+    def __init__(self, knn, scaler, city_data, themes):
+        self.knn, self.scaler, self.city_raw_data = knn, scaler, city_data
+        
+        # Parse the city data once: monthly temperatures, climate labels and budget levels as arrays
+        self.city_temps = parse_monthly_temps(city_data['avg_temp_monthly'].tolist())
+        self.city_climates = get_climate_codes(self.city_temps, CLIMATE_MODES)
+        self.city_budgets = city_data['budget_level'].map(BUDGET_MAP).fillna(1).to_numpy(dtype=np.int8)
+        self.city_regions = city_data['region'].to_numpy()
+        self.city_info = city_data[['city', 'country', 'region', 'short_description', 'budget_level']].to_dict('records')
+        city_scales = scaler.transform(city_data[CITY_FEATURES])
+        self.city_units = to_unit_vectors(city_scales)
+        self.region_index = RegionCityIndex(city_scales, self.city_regions, CITY_INDEX_BRUTE_MAX_SIZE)
+        
+        # Each theme has a single ideal vector, so its neighbors (globally and in every region) are
+        # searched once for every request. The global search is one query per theme, like a request
+        # did: brute-force kneighbors orders tied cities differently in batches
+        self.theme_neighbors = {
+            (theme, region): self.search_neighbors(theme, region)
+            for theme in themes
+            for region in [None, *self.region_index.partitions]
+        }
+        print(f"✅ City neighbors cached for {len(themes)} themes x {len(self.region_index.partitions) + 1} regions")
+    
+    def is_built_from(self, knn, scaler, city_data):
+        return knn is self.knn and scaler is self.scaler and city_data is self.city_raw_data
+    
+    def search_neighbors(self, theme, region=None):
+        ideal_scales = self.scaler.transform([build_ideal_vector(theme)])
+        if region is None:
+            distances, indices = self.knn.kneighbors(ideal_scales, n_neighbors=CITY_NEIGHBORS)
+            distances, indices = distances[0], indices[0]
+        else:
+            distances, indices = self.region_index.search(ideal_scales[0], CITY_NEIGHBORS, region)
+        
+        return indices, 1 - distances
+    
+    def get_theme_neighbors(self, theme, region=None):
+        # Unknown regions fall back to all cities
+        if region not in self.region_index:
+            region = None
+        
+        neighbors = self.theme_neighbors.get((theme, region))
+        if neighbors is None:
+            # Themes outside the label encoder; the entry is added complete
+            neighbors = self.theme_neighbors[(theme, region)] = self.search_neighbors(theme, region)
+        
+        return neighbors
 
 class ThemeCityService:
     # Load models and data    
     def __init__(self):
-        if IS_LOCAL:
-            self.rf = joblib.load(THEME_MODEL_PATH)
-            self.preprocessor = joblib.load(THEME_PREPROCESSOR_PATH)
-            self.le = joblib.load(THEME_LE_PATH)
-            self.knn = joblib.load(CITY_MODEL_PATH)
-            self.scaler = joblib.load(CITY_SCALER_PATH)
-            self.city_raw_data = pd.read_csv(CITY_DATA_PATH)
-        else:
-            print("Running in production, loading models from Hugging Face...")
-            
-            def load_hf_model(url):
-                resp = requests.get(url)
-                resp.raise_for_status()
-                return joblib.load(io.BytesIO(resp.content))
-            
-            self.rf = load_hf_model(THEME_MODEL_PATH)
-            self.preprocessor = load_hf_model(THEME_PREPROCESSOR_PATH)
-            self.le = load_hf_model(THEME_LE_PATH)
-            self.knn = load_hf_model(CITY_MODEL_PATH)
-            self.scaler = load_hf_model(CITY_SCALER_PATH)
-            self.city_raw_data = pd.read_csv(CITY_DATA_PATH)
-    
-    def predict_theme(self, user_input):
-        companion_label = classify_travel_companion(
-            user_input['companion']
-        )
-        
-        processed_input = {
-            'Age': user_input['age'],
-            'Gender': user_input['gender'],
-            'Nationality': user_input['nationality'],
-            'Travel_Companions': companion_label,
-            'Budget_Category': user_input['budget']
-        }
-        df = pd.DataFrame([processed_input])[THEME_FEATURES]
-        df['Budget_Category'] = df['Budget_Category'].map(BUDGET_MAP)
+        if not IS_LOCAL:
+            print("Running in production, loading models from Hugging Face (cached locally)...")
         
-        X_processed = self.preprocessor.transform(df)
-        pred_index = self.rf.predict(X_processed)
+        self.rf = model_registry.get('theme_rf_model')
+        self.preprocessor = model_registry.get('theme_preprocessor')
+        self.le = model_registry.get('theme_label_encoder')
+        self.theme_table = self._load_theme_table()
+        self.cities = None
+        self._city_lock = threading.Lock()
+        self._get_cities()
+    
+    def _get_cities(self):
+        # The city index of the registry's current city model and dataset (see POST /reload/{name});
+        # a request takes it once and uses that snapshot throughout
+        knn = model_registry.get('city_knn_model')
+        scaler = model_registry.get('city_scaler')
+        city_data = model_registry.get('city_data')
+        cities = self.cities
+        if cities is not None and cities.is_built_from(knn, scaler, city_data):
+            return cities
         
-        return self.le.inverse_transform(pred_index)[0]
+        with self._city_lock:
+            if self.cities is None or not self.cities.is_built_from(knn, scaler, city_data):
+                themes = list(dict.fromkeys([*WEIGHT_CONFIG, *self.le.classes_]))
+                self.cities = CityIndex(knn, scaler, city_data, themes)
+            return self.cities
     
-    def _build_ideal_vector(self, theme):
-        vec = np.zeros(len(CITY_FEATURES))
-        theme_weights = WEIGHT_CONFIG.get(theme, {})
+    def _load_theme_table(self):
+        table = model_registry.get('theme_table')
+        if table is None:
+            return None
         
-        for i, feat in enumerate(CITY_FEATURES):
-            if feat in theme_weights:
-                vec[i] = theme_weights[feat] * 10
+        # A table built for another model must not answer; compare a sample of its cells with the model
+        rng = np.random.default_rng(0)
+        axes = [np.arange(table.min_age, table.max_age + 1), *[table.categories[feature] for feature in TABLE_CATEGORIES], np.arange(table.table.shape[-1])]
+        samples = [[axis[i] for axis, i in zip(axes, [rng.integers(len(axis)) for axis in axes])] for _ in range(THEME_TABLE_CHECK_SAMPLES)]
+        df = pd.DataFrame(samples, columns=['Age', *TABLE_CATEGORIES, 'Budget_Category'])
         
-        return vec
+        if not np.array_equal(self.predict_theme_indices(df), [table.lookup(*sample) for sample in samples]):
+            print("⚠️ Theme table differs from the theme model, predicting themes with the model")
+            return None
+        return table
+    
+    def predict_theme_indices(self, df):
+        # df holds THEME_FEATURES with Budget_Category already mapped to its level
+        X_processed = self.preprocessor.transform(df[THEME_FEATURES])
+        return self.rf.predict(X_processed)
+    
+    def predict_themes(self, user_inputs):
+        companion_labels = [classify_travel_companion(user_input['companion']) for user_input in user_inputs]
         
-    def get_complete_recommendations(self, user_input, top_n=5):
-        predicted_theme = self.predict_theme(user_input)
-        ideal_vector = self._build_ideal_vector(predicted_theme)
-        ideal_scales = self.scaler.transform([ideal_vector])
-        distance, indices = self.knn.kneighbors(ideal_scales, n_neighbors=100)
+        # Known profiles are answered from the precomputed table
+        indices = np.full(len(user_inputs), -1, dtype=np.int64)
+        if self.theme_table is not None:
+            indices = self.theme_table.lookup_many(
+                [user_input['age'] for user_input in user_inputs],
+                [user_input['gender'] for user_input in user_inputs],
+                [user_input['nationality'] for user_input in user_inputs],
+                companion_labels,
+                [BUDGET_MAP.get(user_input['budget']) for user_input in user_inputs]
+            )
         
-        candidates = self.city_raw_data.iloc[indices[0]].copy()
-        candidates['similarity'] = 1 - distance[0]
+        # The others go through the model in one call
+        missing = np.flatnonzero(indices < 0)
+        if len(missing):
+            df = pd.DataFrame({
+                'Age': [user_inputs[i]['age'] for i in missing],
+                'Gender': [user_inputs[i]['gender'] for i in missing],
+                'Nationality': [user_inputs[i]['nationality'] for i in missing],
+                'Travel_Companions': [companion_labels[i] for i in missing],
+                'Budget_Category': [user_inputs[i]['budget'] for i in missing]
+            })[THEME_FEATURES]
+            df['Budget_Category'] = df['Budget_Category'].map(BUDGET_MAP)
+            
+            indices[missing] = self.predict_theme_indices(df)
         
-        # Filter candidates by region
+        return self.le.inverse_transform(indices)
+    
+    def predict_theme(self, user_input):
+        return self.predict_themes([user_input])[0]
+    
+    def _get_region(self, user_input):
         user_region = user_input['region']
-        if user_region and user_region != "all":
-            filtered_candidates = candidates[candidates['region'] == user_region].copy()
-            if not filtered_candidates.empty:
-                candidates = filtered_candidates
-        
-        # Calculate budget fit
-        user_val = BUDGET_MAP.get(user_input['budget'], 1)
-        candidates['budget_score'] = candidates['budget_level'].apply(
-            lambda x: 1.5 if BUDGET_MAP.get(x, 1) == user_val else (1.2 if user_val > BUDGET_MAP.get(x, 1) else 0.8)
-        )
-        
-        # Get total score
-        candidates['final_score'] = candidates['similarity'] * candidates['budget_score']
+        return user_region if user_region and user_region != "all" else None
+    
+    def _get_budget_scores(self, budget, city_budgets):
+        user_val = BUDGET_MAP.get(budget, 1)
+        return np.where(city_budgets == user_val, 1.5, np.where(user_val > city_budgets, 1.2, 0.8))
+    
+    def _rank_cities(self, cities, theme, region, budget, top_n):
+        # Nearest cities inside the region (or of all regions)
+        candidates, similarity = cities.get_theme_neighbors(theme, region)
         
-        results = candidates.sort_values(by='final_score', ascending=False).head(top_n)
+        # Get total score with the budget fit
+        final_score = similarity * self._get_budget_scores(budget, cities.city_budgets[candidates])
         
+        order = np.argsort(-final_score, kind='stable')[:top_n]
+        return candidates[order], final_score[order]
+    
+    def _build_city_recommendations(self, cities, selected):
         city_recommendations = []
-        for _, row in results.iterrows():
-            climate_calendar = get_city_climate_calendar(row, CLIMATE_MODES)
+        for city in selected:
             rec = {
-                'city': row['city'],
-                'country': row['country'],
-                'region': row['region'],
-                'short_description': row['short_description'],
-                'budget_level': row['budget_level'],
-                'climate_calendar': climate_calendar
+                **cities.city_info[city],
+                'climate_calendar': build_climate_calendar(cities.city_temps[city], cities.city_climates[city], list(CLIMATE_MODES))
             }
             city_recommendations.append(rec)
 
-        return city_recommendations
\ No newline at end of file
+        return city_recommendations
+    
+    def get_complete_recommendations(self, user_input, top_n=5):
+        predicted_theme = self.predict_theme(user_input)
+        cities = self._get_cities()
+        selected, _ = self._rank_cities(cities, predicted_theme, self._get_region(user_input), user_input['budget'], top_n)
+        
+        return self._build_city_recommendations(cities, selected)
+    
+    def _get_consensus(self, cities, user_inputs, themes, member_cities, top_n):
+        # Pool the candidates of every member, then score each pooled city for every member whose region
+        # includes it; a city outside a member's region scores 0 for that member
+        regions = [self._get_region(user_input) for user_input in user_inputs]
+        pool = np.unique(np.concatenate([
+            cities.get_theme_neighbors(theme, region)[0] for region, theme in zip(regions, themes)
+        ]))
+        unique_themes, theme_columns = np.unique(themes, return_inverse=True)
+        ideal_units = to_unit_vectors(cities.scaler.transform([build_ideal_vector(theme) for theme in unique_themes]))
+        similarity = cities.city_units[pool] @ ideal_units.T
+        pool_budgets = cities.city_budgets[pool]
+        pool_regions = cities.city_regions[pool]
+        
+        scores = np.zeros((len(pool), len(user_inputs)))
+        for member, (user_input, region, column) in enumerate(zip(user_inputs, regions, theme_columns)):
+            # Unknown regions fall back to all cities, as in the member's own ranking
+            rows = np.flatnonzero(pool_regions == region) if region in cities.region_index else slice(None)
+            scores[rows, member] = similarity[rows, column] * self._get_budget_scores(user_input['budget'], pool_budgets[rows])
+        mean_scores = scores.mean(axis=1)
+        support = np.array([sum(city in cities for cities in member_cities) for city in pool])
+        
+        order = np.argsort(-mean_scores, kind='stable')[:top_n]
+        return [
+            {**rec, 'score': float(mean_scores[i]), 'support': int(support[i])}
+            for rec, i in zip(self._build_city_recommendations(cities, pool[order]), order)
+        ]
+    
+    def get_batch_recommendations(self, user_inputs, top_n=5, consensus=False):
+        """City recommendations of many profiles, with one theme prediction call for all of them."""
+        themes = self.predict_themes(user_inputs)
+        cities = self._get_cities()
+        
+        member_cities = []
+        recommendations = []
+        for user_input, theme in zip(user_inputs, themes):
+            selected, _ = self._rank_cities(cities, theme, self._get_region(user_input), user_input['budget'], top_n)
+            member_cities.append(set(selected.tolist()))
+            recommendations.append({
+                'theme': str(theme),
+                'cities': self._build_city_recommendations(cities, selected)
+            })
+        
+        return {
+            'recommendations': recommendations,
+            'consensus': self._get_consensus(cities, user_inputs, themes, member_cities, top_n) if consensus else None
+        }
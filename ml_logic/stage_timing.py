@@ -0,0 +1,50 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_current_timings = ContextVar('stage_timings', default=None)
+
+class StageTimings:
+    """Wall time per named stage of one request; repeated stages add up."""
+    def __init__(self):
+        self.durations = {}
+
+    def add(self, stage, seconds):
+        self.durations[stage] = self.durations.get(stage, 0.0) + seconds
+
+    def merge(self, durations):
+        for stage, seconds in durations.items():
+            self.add(stage, seconds)
+
+    def to_server_timing(self, total=None):
+        entries = [f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in self.durations.items()]
+        if total is not None:
+            entries.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(entries)
+
+def get_current_timings():
+    return _current_timings.get()
+
+@contextmanager
+def collect_stage_timings():
+    """Collect the stages timed inside the block (and in threads started from it) into a new StageTimings."""
+    timings = StageTimings()
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+
+@contextmanager
+def timed_stage(stage):
+    # Outside of a collecting request this only costs a context variable lookup
+    timings = _current_timings.get()
+    if timings is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(stage, time.perf_counter() - started)
@@ -0,0 +1,307 @@
+"""
+Benchmark of the booking strategy hot paths (BookingService / VisualService).
+
+By default it trains small stand-in pipelines on synthetic bookings (same preprocessing and LightGBM
+layout as the notebooks), so it needs no model files and no network. Each stage is timed per call over
+synthetic BookingStrategyInfo inputs, in both flexible-year modes, and compared with the saved baseline.
+
+Timings depend on the host, so the baseline is per machine: it is not committed (see .gitignore), and one
+recorded on a different machine or Python version is not compared against. Record it on the machine that
+runs the check, from the code before the change under test.
+
+Run from the repository root:
+    python -m scripts.benchmark_booking                      # compare with the baseline, exit 1 on regressions
+    python -m scripts.benchmark_booking --save-baseline      # record a new baseline on this machine
+    python -m scripts.benchmark_booking --models configured  # benchmark the models from ml_logic.config
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder
+from lightgbm import LGBMClassifier, LGBMRegressor
+from ml_logic.config import BOOKING_FEATURES, SWEEP_PROFILE_FEATURES
+from ml_logic.model_registry import model_registry
+from ml_logic.processors.sweep_store import SweepStore
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_booking_baseline.json")
+
+STUB_COUNTRIES = ['PRT', 'GBR', 'FRA', 'ESP', 'DEU', 'USA', 'TWN', 'JPN', 'ITA', 'IRL']
+INPUT_COUNTRIES = ['Portugal', 'UK', 'France', 'Spain', 'Germany', 'USA', 'Taiwan', 'Japan', 'Brazil']
+COMPANIONS = [
+    {'babies': 0, 'children': 0, 'adults': 1, 'seniors': 0},
+    {'babies': 0, 'children': 0, 'adults': 2, 'seniors': 0},
+    {'babies': 1, 'children': 2, 'adults': 2, 'seniors': 0},
+    {'babies': 0, 'children': 0, 'adults': 2, 'seniors': 2},
+    {'babies': 0, 'children': 0, 'adults': 6, 'seniors': 0}
+]
+
+def build_stub_artifacts(seed=0, n=6000):
+    """Stand-in cancellation/price pipelines and monthly stats trained on synthetic bookings."""
+    rng = np.random.default_rng(seed)
+    month = rng.integers(1, 13, n)
+    X = pd.DataFrame({
+        'hotel': rng.choice(['City Hotel', 'Resort Hotel'], n),
+        'lead_time': rng.integers(0, 710, n),
+        'arrival_date_month_num': month,
+        'arrival_date_week_number': np.clip((month - 1) * 4.4 + rng.integers(1, 5, n), 1, 53).astype(int),
+        'stays_in_weekend_nights': rng.integers(0, 5, n),
+        'stays_in_week_nights': rng.integers(0, 10, n),
+        'adults': rng.integers(1, 5, n),
+        'children': rng.integers(0, 3, n),
+        'babies': rng.integers(0, 2, n),
+        'country': rng.choice(STUB_COUNTRIES, n),
+        'market_segment': rng.choice(['Online TA', 'Offline TA/TO', 'Direct', 'Groups'], n),
+        'deposit_type': rng.choice(['No Deposit', 'Non Refund'], n),
+        'customer_type': rng.choice(['Transient', 'Transient-Party', 'Contract', 'Group'], n),
+        'required_car_parking_spaces': rng.integers(0, 2, n),
+        'total_of_special_requests': rng.integers(0, 3, n)
+    })[BOOKING_FEATURES]
+    is_canceled = (rng.random(n) < 0.2 + 0.5 * X['lead_time'] / 710).astype(int)
+    adr = 60 + 40 * np.sin(X['arrival_date_month_num'] / 12 * 2 * np.pi) + 8 * X['adults'] + (X['hotel'] == 'Resort Hotel') * 20 + rng.normal(0, 5, n)
+
+    def preprocessor():
+        return ColumnTransformer(
+            transformers=[
+                ('cat', OneHotEncoder(handle_unknown='ignore'), ['hotel', 'market_segment', 'deposit_type', 'customer_type']),
+                ('ord', OrdinalEncoder(handle_unknown='use_encoded_value', unknown_value=-1), ['country'])
+            ],
+            remainder='passthrough'
+        )
+
+    cancel_pipeline = Pipeline(steps=[
+        ('preprocessor', preprocessor()),
+        ('classifier', LGBMClassifier(objective='binary', random_state=42, n_jobs=1, verbose=-1))
+    ]).fit(X, is_canceled)
+    price_pipeline = Pipeline(steps=[
+        ('preprocessor', preprocessor()),
+        ('regressor', LGBMRegressor(random_state=42, n_jobs=1, verbose=-1))
+    ]).fit(X, adr)
+
+    country_monthly_stats = X.assign(adr=adr).groupby(['country', 'arrival_date_month_num'])['adr'].agg(
+        avg_adr='mean', max_adr='max', min_adr='min', count='size'
+    ).reset_index()
+
+    return {
+        'cancel_pipeline': cancel_pipeline,
+        'price_pipeline': price_pipeline,
+        'country_monthly_stats': country_monthly_stats
+    }
+
+def make_inputs(n, seed=0):
+    """Synthetic BookingStrategyInfo payloads, with arrivals relative to today so the workload is stable."""
+    rng = np.random.default_rng(seed)
+    today = pd.Timestamp.now().normalize()
+    inputs = []
+
+    for _ in range(n):
+        arrival = today + pd.Timedelta(days=int(rng.integers(3, 400)))
+        leave = arrival + pd.Timedelta(days=int(rng.integers(1, 11)))
+        inputs.append({
+            'hotel': str(rng.choice(['City Hotel', 'Resort Hotel'])),
+            'arrival_date': arrival.strftime('%Y-%m-%d'),
+            'leave_date': leave.strftime('%Y-%m-%d'),
+            'companion': COMPANIONS[int(rng.integers(len(COMPANIONS)))],
+            'country_name': str(rng.choice(INPUT_COUNTRIES))
+        })
+
+    return inputs
+
+
+def time_stage(fn, calls, rounds):
+    samples = []
+    for _ in range(rounds):
+        for args in calls:
+            started = time.perf_counter()
+            fn(*args)
+            samples.append(time.perf_counter() - started)
+    return np.array(samples) * 1000
+
+def measure_allocations(fn, calls):
+    # Peak traced memory above the starting point, per call (NumPy buffers are traced too)
+    peaks = []
+    tracemalloc.start()
+    try:
+        for args in calls:
+            tracemalloc.reset_peak()
+            current, _ = tracemalloc.get_traced_memory()
+            fn(*args)
+            peaks.append(tracemalloc.get_traced_memory()[1] - current)
+    finally:
+        tracemalloc.stop()
+    return float(np.mean(peaks)) / 1024
+
+def get_stages(booking_service, inputs, is_flexible_year, now):
+    """Stage name -> (function, argument tuples), with every intermediate prepared up front."""
+    visual_service = booking_service.visual_service
+    payloads = [{**user_input, 'is_flexible_year': is_flexible_year} for user_input in inputs]
+    feature_list = [booking_service.build_booking_features(payload) for payload in payloads]
+
+    def score_current(features):
+        columns = booking_service._to_feature_columns([features])
+        booking_service.predict_risk(columns, 1)
+        booking_service.predict_price(columns, 1)
+
+    def sweep_cold(features):
+        booking_service.sweep_cache.clear()
+        return booking_service._get_cached_sweeps([features], now)[0]
+
+    def strategy_cold(payload):
+        booking_service.sweep_cache.clear()
+        return booking_service.get_hotel_booking_strategy(payload)
+
+    prepared = []
+    for payload, features in zip(payloads, feature_list):
+        columns = booking_service._to_feature_columns([features])
+        w_risk, w_price = booking_service.get_risk_price_weight(payload['companion'])
+        res_df = booking_service._select_sweep(sweep_cold(features), int(features['lead_time']), is_flexible_year)
+        advices = booking_service._select_advices(features, res_df, w_risk, w_price, is_flexible_year)
+        cp_advice, month_advice, lt_advice = booking_service._get_date_matches(
+            list(advices), features['stays_in_weekend_nights'], features['stays_in_week_nights']
+        )
+        prepared.append({
+            'payload': payload,
+            'features': features,
+            'prob': float(booking_service.predict_risk(columns, 1)[0]),
+            'weights': (w_risk, w_price),
+            'res_df': res_df,
+            'advices': advices,
+            'matched': {'cp': cp_advice, 'month': month_advice, 'lt': lt_advice}
+        })
+
+    return {
+        'features': (booking_service.build_booking_features, [(p['payload'],) for p in prepared]),
+        'current_scoring': (score_current, [(p['features'],) for p in prepared]),
+        'lead_time_sweep': (sweep_cold, [(p['features'],) for p in prepared]),
+        'advice_selection': (booking_service._select_advices, [
+            (p['features'], p['res_df'], *p['weights'], is_flexible_year) for p in prepared
+        ]),
+        'date_matching': (booking_service._get_date_matches, [
+            (list(p['advices']), p['features']['stays_in_weekend_nights'], p['features']['stays_in_week_nights']) for p in prepared
+        ]),
+        'donut_chart': (visual_service.draw_risk_donut, [(p['prob'],) for p in prepared]),
+        'bubble_chart': (visual_service.plot_bubble_recommendation, [
+            (p['res_df'], p['matched']['cp'], p['matched']['lt'], p['matched']['month']) for p in prepared
+        ]),
+        'end_to_end': (strategy_cold, [(p['payload'],) for p in prepared])
+    }
+
+def run_benchmark(booking_service, inputs, rounds):
+    now = pd.Timestamp.now().normalize()
+    results = {}
+
+    for is_flexible_year in (False, True):
+        mode = f"flexible_year={is_flexible_year}"
+        results[mode] = {}
+        for stage, (fn, calls) in get_stages(booking_service, inputs, is_flexible_year, now).items():
+            time_stage(fn, calls, 1)  # warm-up
+            samples = time_stage(fn, calls, rounds)
+            results[mode][stage] = {
+                'median_ms': float(np.median(samples)),
+                'p95_ms': float(np.percentile(samples, 95)),
+                'peak_kib': measure_allocations(fn, calls)
+            }
+            if stage == 'end_to_end':
+                results[mode][stage]['requests_per_sec'] = 1000 / float(np.mean(samples))
+
+    return results
+
+def print_results(results, baseline=None):
+    for mode, stages in results.items():
+        print(f"\n{mode}")
+        print(f"  {'stage':<18}{'median ms':>11}{'p95 ms':>10}{'peak KiB':>11}{'vs baseline':>13}")
+        for stage, stats in stages.items():
+            reference = (baseline or {}).get(mode, {}).get(stage)
+            change = f"{stats['median_ms'] / reference['median_ms'] - 1:+.0%}" if reference else '-'
+            print(f"  {stage:<18}{stats['median_ms']:>11.3f}{stats['p95_ms']:>10.3f}{stats['peak_kib']:>11.1f}{change:>13}")
+        print(f"  requests/sec (end to end, cold sweep cache): {stages['end_to_end']['requests_per_sec']:.1f}")
+
+def find_regressions(results, baseline, tolerance, slack):
+    # A stage regresses when it is both `tolerance` slower/larger and above the absolute slack,
+    # so sub-millisecond stages do not fail on timer noise
+    regressions = []
+    for mode, stages in baseline.items():
+        for stage, reference in stages.items():
+            current = results.get(mode, {}).get(stage)
+            if current is None:
+                regressions.append(f"{mode} {stage}: stage missing")
+                continue
+            for metric in ('median_ms', 'peak_kib'):
+                if current[metric] > reference[metric] * (1 + tolerance) + slack[metric]:
+                    regressions.append(f"{mode} {stage}: {metric} {current[metric]:.3f} > baseline {reference[metric]:.3f} (+{tolerance:.0%} and {slack[metric]} allowed)")
+    return regressions
+
+def get_machine():
+    return f"{platform.machine()} / {os.cpu_count()} cpus / Python {platform.python_version()}"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", choices=["stub", "configured"], default="stub", help="stand-in models or the ones from ml_logic.config")
+    parser.add_argument("--inputs", type=int, default=24, help="synthetic requests per mode")
+    parser.add_argument("--rounds", type=int, default=7, help="timed passes over the inputs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="allowed slowdown / extra memory before failing")
+    parser.add_argument("--min-delta-ms", type=float, default=0.25, help="absolute slowdown always allowed per stage")
+    parser.add_argument("--min-delta-kib", type=float, default=4.0, help="absolute extra memory always allowed per stage")
+    args = parser.parse_args()
+
+    if args.models == "stub":
+        for name, artifact in build_stub_artifacts(args.seed).items():
+            model_registry.register(name, lambda artifact=artifact: artifact)
+
+    booking_service = model_registry.get('booking_service')
+    # Measure the single-request path: no micro-batching window, no precomputed sweeps
+    booking_service.use_dispatcher = False
+    booking_service.sweep_store = SweepStore(None, SWEEP_PROFILE_FEATURES)
+
+    results = run_benchmark(booking_service, make_inputs(args.inputs, args.seed), args.rounds)
+
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('models') != args.models:
+            print(f"⚠️ Baseline was recorded with --models {baseline.get('models')}, not comparing")
+            baseline = None
+        elif baseline.get('machine') != get_machine():
+            print(f"⚠️ Baseline was recorded on {baseline.get('machine')}, not on this machine ({get_machine()}), not comparing")
+            baseline = None
+    elif not args.save_baseline:
+        print(f"⚠️ No baseline at {args.baseline}; record one on this machine with --save-baseline")
+
+    print_results(results, baseline and baseline['results'])
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({
+                'models': args.models,
+                'inputs': args.inputs,
+                'machine': get_machine(),
+                'results': results
+            }, f, indent=2)
+        print(f"\n✅ Saved baseline to {args.baseline}")
+        return 0
+
+    if baseline:
+        slack = {'median_ms': args.min_delta_ms, 'peak_kib': args.min_delta_kib}
+        regressions = find_regressions(results, baseline['results'], args.tolerance, slack)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) against {args.baseline}:")
+            for regression in regressions:
+                print(f"  - {regression}")
+            return 1
+        print("\n✅ No regressions against the baseline")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
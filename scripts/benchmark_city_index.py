@@ -0,0 +1,127 @@
+"""
+Benchmark of the region-partitioned city index (ml_logic.processors.city_index) against the former
+post-filter search: the CITY_NEIGHBORS nearest cities of all regions, then the region filter.
+
+It builds a large synthetic city set (continuous ratings, regions of very different sizes), fits the
+same MinMaxScaler + cosine NearestNeighbors as the city_recommender notebook and runs theme queries for
+random regions and budgets. The ground truth is the exact top_n of the region by final score (similarity
+x budget fit). For each search it reports latency, recall@top_n against that truth, how often the list
+is shorter than top_n and how often it holds cities of other regions (the all-regions fallback).
+
+Run from the repository root:
+    python -m scripts.benchmark_city_index                  # 200k cities, 300 queries
+    python -m scripts.benchmark_city_index --cities 1000000
+"""
+import argparse
+import sys
+import time
+import numpy as np
+from sklearn.neighbors import NearestNeighbors
+from sklearn.preprocessing import MinMaxScaler
+from ml_logic.config import CITY_FEATURES, CITY_NEIGHBORS, CITY_INDEX_BRUTE_MAX_SIZE, WEIGHT_CONFIG
+from ml_logic.processors.city_index import RegionCityIndex
+
+# Share of the cities in each region, from a large continent down to a few islands
+REGION_SHARES = {
+    'europe': 0.35, 'asia': 0.3, 'north_america': 0.15, 'south_america': 0.08,
+    'africa': 0.06, 'middle_east': 0.04, 'oceania': 0.018, 'antarctica': 0.002
+}
+
+def make_cities(n, seed):
+    rng = np.random.default_rng(seed)
+    features = rng.uniform(1, 5, (n, len(CITY_FEATURES)))
+    regions = rng.choice(list(REGION_SHARES), n, p=list(REGION_SHARES.values()))
+    budgets = rng.integers(0, 3, n)
+    return features, regions, budgets
+
+def make_queries(n, seed):
+    rng = np.random.default_rng(seed + 1)
+    themes = list(WEIGHT_CONFIG)
+    queries = []
+    for _ in range(n):
+        weights = WEIGHT_CONFIG[themes[rng.integers(len(themes))]]
+        vector = np.array([weights.get(feature, 0) * 10 for feature in CITY_FEATURES])
+        vector = vector * rng.uniform(0.8, 1.2, len(vector))
+        queries.append((vector, rng.choice(list(REGION_SHARES)), int(rng.integers(0, 3))))
+    return queries
+
+def rank(candidates, similarity, budgets, user_budget, top_n):
+    # Budget fit and ranking of ThemeCityService.get_complete_recommendations
+    city_budgets = budgets[candidates]
+    budget_score = np.where(city_budgets == user_budget, 1.5, np.where(user_budget > city_budgets, 1.2, 0.8))
+    return candidates[np.argsort(-(similarity * budget_score), kind='stable')[:top_n]]
+
+def search_post_filter(knn, regions, query, region):
+    distances, indices = knn.kneighbors(query[None, :], n_neighbors=CITY_NEIGHBORS)
+    candidates, similarity = indices[0], 1 - distances[0]
+    in_region = regions[candidates] == region
+    if in_region.any():
+        candidates, similarity = candidates[in_region], similarity[in_region]
+    return candidates, similarity
+
+def search_partitioned(index, query, region):
+    distances, indices = index.search(query, CITY_NEIGHBORS, region)
+    return indices, 1 - distances
+
+def get_truth(unit, regions, budgets, query, region, user_budget, top_n):
+    rows = np.flatnonzero(regions == region)
+    similarity = unit[rows] @ (query / np.linalg.norm(query))
+    return rank(rows, similarity, budgets, user_budget, top_n)
+
+def run(name, search, queries, regions, budgets, truths, top_n):
+    latencies, recalls, short, off_region = [], [], 0, 0
+    for (query, region, user_budget), truth in zip(queries, truths):
+        started = time.perf_counter()
+        candidates, similarity = search(query, region)
+        results = rank(candidates, similarity, budgets, user_budget, top_n)
+        latencies.append(time.perf_counter() - started)
+
+        recalls.append(len(np.intersect1d(results, truth)) / len(truth))
+        short += len(results) < len(truth)
+        off_region += bool((regions[results] != region).any())
+
+    latencies = np.array(latencies) * 1000
+    print(f"  {name:<22} {np.percentile(latencies, 50):8.3f} {np.percentile(latencies, 95):8.3f} "
+          f"{np.mean(recalls):8.1%} {short / len(queries):8.1%} {off_region / len(queries):8.1%}")
+    return np.mean(recalls)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cities", type=int, default=200000, help="synthetic cities")
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--top-n", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    features, regions, budgets = make_cities(args.cities, args.seed)
+    scaler = MinMaxScaler().fit(features)
+    scaled = scaler.transform(features)
+    queries = [(scaler.transform(vector[None, :])[0], region, budget) for vector, region, budget in make_queries(args.queries, args.seed)]
+
+    started = time.perf_counter()
+    knn = NearestNeighbors(metric='cosine', algorithm='brute').fit(scaled)
+    print(f"global NearestNeighbors fit: {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    indexes = {}
+    for name, brute_max_size in [('partitioned', CITY_INDEX_BRUTE_MAX_SIZE), ('partitioned (brute)', len(scaled)), ('partitioned (tree)', 0)]:
+        started = time.perf_counter()
+        indexes[name] = RegionCityIndex(scaled, regions, brute_max_size)
+        print(f"{name} build: {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    print("\n" + ", ".join(f"{region} {stats['cities']} ({stats['kind']})" for region, stats in indexes['partitioned'].get_stats().items()))
+
+    unit = scaled / np.linalg.norm(scaled, axis=1, keepdims=True)
+    truths = [get_truth(unit, regions, budgets, query, region, budget, args.top_n) for query, region, budget in queries]
+
+    print(f"\n{args.cities} cities, {args.queries} queries, top_n={args.top_n}, {CITY_NEIGHBORS} neighbors")
+    print(f"  {'search':<22} {'p50 ms':>8} {'p95 ms':>8} {'recall':>8} {'short':>8} {'off-reg':>8}")
+    run('post-filter', lambda query, region: search_post_filter(knn, regions, query, region), queries, regions, budgets, truths, args.top_n)
+    worst = 1.0
+    for name, index in indexes.items():
+        recall = run(name, lambda query, region, index=index: search_partitioned(index, query, region), queries, regions, budgets, truths, args.top_n)
+        worst = min(worst, recall)
+
+    return 0 if worst > 0.95 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+Benchmark of inference pool layouts (ml_logic.inference_pool) under concurrent booking requests.
+
+A layout is WORKERSxCONCURRENCY: worker processes x requests each one runs at a time. Workers with a
+concurrency above 1 micro-batch the model calls of their concurrent requests; one-at-a-time workers have
+nothing to batch and run without the dispatcher. For every layout the same synthetic BookingStrategyInfo inputs are sent twice with
+--clients requests in flight: a cold round (new profiles, every sweep is scored) and a warm round (the
+sweeps are cached, as for returning users). It reports throughput, latency, the sweep cache hit rate of
+each round and the average number of requests sharing a model call.
+
+Workers are separate processes that load the models from ml_logic.config, so there are no stand-in models.
+Run from the repository root, preferably on the production core count:
+    python -m scripts.benchmark_inference_pool                     # one-per-core vs half the workers batching 4 requests
+    python -m scripts.benchmark_inference_pool --layouts 8x1 4x4 2x8
+"""
+import argparse
+import asyncio
+import time
+import numpy as np
+from ml_logic.config import AVAILABLE_CORES
+from ml_logic.inference_pool import InferencePool
+from scripts.benchmark_booking import make_inputs
+
+def parse_layout(layout):
+    workers, concurrency = (int(part) for part in layout.lower().split('x'))
+    return workers, concurrency
+
+def get_key(user_input):
+    # Same routing key as the /booking route
+    return (user_input['country_name'], *user_input['companion'].values())
+
+async def run_round(pool, inputs, clients):
+    latencies = []
+    slots = asyncio.Semaphore(clients)
+
+    async def request(user_input):
+        async with slots:
+            started = time.perf_counter()
+            await pool.run('booking_service', 'get_hotel_booking_strategy', user_input, key=get_key(user_input))
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[request(user_input) for user_input in inputs])
+    elapsed = time.perf_counter() - started
+
+    latencies = np.array(latencies) * 1000
+    return len(inputs) / elapsed, np.percentile(latencies, 50), np.percentile(latencies, 95)
+
+def sum_stats(worker_stats, *path):
+    total = 0
+    for stats in worker_stats.values():
+        for name in path:
+            stats = stats[name]
+        total += stats
+    return total
+
+async def benchmark(layout, inputs, clients):
+    workers, concurrency = parse_layout(layout)
+    pool = InferencePool(workers, max(1, AVAILABLE_CORES // workers), concurrency)
+
+    try:
+        await pool.warm_up()
+        for name in ('cold', 'warm'):
+            before = await pool.run_on_all('booking_service', 'get_cache_stats')
+            throughput, p50, p95 = await run_round(pool, inputs, clients)
+            cache = await pool.run_on_all('booking_service', 'get_cache_stats')
+            dispatch = await pool.run_on_all('booking_service', 'get_dispatcher_stats')
+
+            hits = sum_stats(cache, 'hits') - sum_stats(before, 'hits')
+            lookups = hits + sum_stats(cache, 'misses') - sum_stats(before, 'misses')
+            batches = sum_stats(dispatch, 'risk', 'batches') + sum_stats(dispatch, 'price', 'batches')
+            requests = sum_stats(dispatch, 'risk', 'requests') + sum_stats(dispatch, 'price', 'requests')
+            print(f"  {layout:<8}{name:<6}{throughput:>10.1f}{p50:>10.0f}{p95:>10.0f}"
+                  f"{hits / lookups if lookups else 0:>10.1%}{requests / batches if batches else 1:>12.2f}")
+    finally:
+        pool.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--layouts", nargs="+", default=[f"{AVAILABLE_CORES}x1", f"{max(1, AVAILABLE_CORES // 2)}x4"], help="WORKERSxCONCURRENCY layouts to compare")
+    parser.add_argument("--inputs", type=int, default=192, help="synthetic requests per round")
+    parser.add_argument("--clients", type=int, default=32, help="requests in flight")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    inputs = [{**user_input, 'is_flexible_year': i % 2 == 1} for i, user_input in enumerate(make_inputs(args.inputs, args.seed))]
+    print(f"{AVAILABLE_CORES} cores, {args.inputs} requests per round, {args.clients} in flight")
+    print(f"  {'layout':<8}{'round':<6}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'cache hit':>10}{'req/batch':>12}")
+    for layout in dict.fromkeys(args.layouts):
+        asyncio.run(benchmark(layout, inputs, args.clients))
+
+if __name__ == "__main__":
+    main()
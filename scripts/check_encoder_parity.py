@@ -0,0 +1,58 @@
+"""
+Parity check of the compiled booking feature encoders (ml_logic.processors.feature_encoder) against the
+sklearn pipelines they replace.
+
+Every combination of the categories the pipelines' encoders know (plus an unseen and a missing value per
+feature) is encoded both ways, each with a few random draws of the numeric features. The model matrices
+and the predictions must match exactly; any difference is listed and the script exits 1. Run it whenever
+a booking model changes, before it is published:
+    python -m scripts.check_encoder_parity                  # the models from ml_logic.config
+    python -m scripts.check_encoder_parity --models stub    # stand-in models of scripts.benchmark_booking
+"""
+import argparse
+import sys
+import time
+from ml_logic.config import BOOKING_FEATURES
+from ml_logic.model_registry import model_registry
+from ml_logic.processors.feature_encoder import CompiledFeatureEncoder, build_category_grid, find_encoder_mismatches
+from scripts.benchmark_booking import build_stub_artifacts
+
+PIPELINES = {'cancel_pipeline': 'predict_proba', 'price_pipeline': 'predict'}
+
+def check(name, predict_method, numeric_rows, max_examples):
+    started = time.perf_counter()
+    pipeline = model_registry.get(name)
+    try:
+        encoder, estimator = CompiledFeatureEncoder.from_pipeline(pipeline, BOOKING_FEATURES)
+    except ValueError as e:
+        print(f"❌ {name}: cannot be compiled ({e})")
+        return False
+
+    frame = build_category_grid(encoder, numeric_rows)
+    mismatches = find_encoder_mismatches(pipeline, encoder, estimator, predict_method, frame)
+    space = ", ".join(f"{col} {len(categories)}" for col, categories in encoder.get_category_space().items())
+
+    if len(mismatches):
+        print(f"❌ {name}: {len(mismatches)} of {len(frame)} rows differ from the pipeline (categories: {space})")
+        print(frame.iloc[mismatches[:max_examples]].to_string())
+        return False
+
+    print(f"✅ {name}: {len(frame)} rows match the pipeline (categories: {space}) in {time.perf_counter() - started:.1f}s")
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", choices=["stub", "configured"], default="configured", help="stand-in models or the ones from ml_logic.config")
+    parser.add_argument("--numeric-rows", type=int, default=3, help="numeric feature draws per category combination")
+    parser.add_argument("--max-examples", type=int, default=10, help="differing rows to print")
+    args = parser.parse_args()
+
+    if args.models == "stub":
+        for name, artifact in build_stub_artifacts().items():
+            model_registry.register(name, lambda artifact=artifact: artifact)
+
+    results = [check(name, predict_method, args.numeric_rows, args.max_examples) for name, predict_method in PIPELINES.items()]
+    return 0 if all(results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
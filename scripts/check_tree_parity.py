@@ -0,0 +1,106 @@
+"""
+Parity check of the flattened booking trees (ml_logic.processors.tree_ensemble) against the LightGBM
+models they replace.
+
+The rows are encoded with the compiled feature encoders, as the booking service does, and come from:
+  - bookings: the training data (ml_research/data/hotel_bookings.csv, see --data), when it is present
+  - sweeps: every category combination the encoders know, each at a random lead time with the arrival
+    month and week of the real calendar, as in a lead-time sweep
+  - splits: the models' own split thresholds and their neighbouring floats, zero and NaN
+Raw scores and predictions must match exactly; any difference is listed and the script exits 1. Run it
+whenever a booking model changes, before it is published:
+    python -m scripts.check_tree_parity                  # the models from ml_logic.config
+    python -m scripts.check_tree_parity --models stub    # stand-in models of scripts.benchmark_booking
+"""
+import argparse
+import calendar
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+from ml_logic.config import DATA_DIR, BOOKING_FEATURES
+from ml_logic.model_registry import model_registry
+from ml_logic.processors.feature_encoder import CompiledFeatureEncoder, build_category_grid
+from ml_logic.processors.tree_ensemble import FlatTreeEnsemble, build_parity_matrix, find_tree_mismatches
+from scripts.benchmark_booking import build_stub_artifacts
+
+PIPELINES = {'cancel_pipeline': 'predict_proba', 'price_pipeline': 'predict'}
+DEFAULT_DATA_PATH = os.path.join(DATA_DIR, 'hotel_bookings.csv')
+MAX_LEAD_TIME = 730
+
+def load_bookings(path):
+    bookings = pd.read_csv(path)
+    month_map = {name: i for i, name in enumerate(calendar.month_name) if name}
+    bookings['arrival_date_month_num'] = bookings['arrival_date_month'].map(month_map)
+    return bookings[BOOKING_FEATURES]
+
+def build_sweep_rows(encoder, seed=42):
+    rng = np.random.default_rng(seed)
+    frame = build_category_grid(encoder, seed=seed)
+
+    lts = rng.integers(0, MAX_LEAD_TIME + 1, len(frame))
+    arrivals = pd.Timestamp.now().normalize() + pd.to_timedelta(lts, unit='D')
+    frame['lead_time'] = lts
+    frame['arrival_date_month_num'] = arrivals.month.to_numpy(dtype=np.int64)
+    frame['arrival_date_week_number'] = arrivals.isocalendar()['week'].to_numpy(dtype=np.int64)
+    return frame
+
+def encode(encoder, frame):
+    return encoder.transform({col: frame[col].to_numpy() for col in encoder.feature_names}, len(frame))
+
+def check(name, predict_method, bookings, max_examples):
+    pipeline = model_registry.get(name)
+    try:
+        encoder, estimator = CompiledFeatureEncoder.from_pipeline(pipeline, BOOKING_FEATURES)
+        ensemble = FlatTreeEnsemble.from_lgbm(estimator)
+    except ValueError as e:
+        print(f"❌ {name}: cannot be flattened ({e})")
+        return False
+
+    row_sets = {'sweeps': build_sweep_rows(encoder)}
+    if bookings is not None:
+        row_sets['bookings'] = bookings
+    matrices = {label: encode(encoder, frame) for label, frame in row_sets.items()}
+    matrices['splits'] = build_parity_matrix(ensemble)
+
+    passed = True
+    for label, X in matrices.items():
+        started = time.perf_counter()
+        mismatches = find_tree_mismatches(estimator, ensemble, X, predict_method)
+
+        if len(mismatches):
+            passed = False
+            print(f"❌ {name} / {label}: {len(mismatches)} of {len(X)} rows differ from LightGBM")
+            examples = row_sets[label].iloc[mismatches[:max_examples]] if label in row_sets else pd.DataFrame(X[mismatches[:max_examples]])
+            print(examples.to_string())
+        else:
+            print(f"✅ {name} / {label}: {len(X)} rows match LightGBM in {time.perf_counter() - started:.1f}s")
+
+    return passed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", choices=["stub", "configured"], default="configured", help="stand-in models or the ones from ml_logic.config")
+    parser.add_argument("--data", default=DEFAULT_DATA_PATH, help="hotel_bookings.csv the models were trained on")
+    parser.add_argument("--max-examples", type=int, default=10, help="differing rows to print")
+    args = parser.parse_args()
+
+    if args.models == "stub":
+        for name, artifact in build_stub_artifacts().items():
+            model_registry.register(name, lambda artifact=artifact: artifact)
+
+    bookings = None
+    if os.path.exists(args.data):
+        bookings = load_bookings(args.data)
+    elif args.data != DEFAULT_DATA_PATH:
+        print(f"❌ Training data not found: {args.data}")
+        return 1
+    else:
+        print(f"⚠️ Training data not found at {args.data}, checking the sweep and split rows only")
+
+    results = [check(name, predict_method, bookings, args.max_examples) for name, predict_method in PIPELINES.items()]
+    return 0 if all(results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
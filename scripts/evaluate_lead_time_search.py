@@ -0,0 +1,154 @@
+"""
+Evaluation of the lead-time sweep search against the exhaustive grid.
+
+Sweeps send one row per tree cell to the models (BookingService.sweep_cells): lead times whose lead time,
+arrival month and week fall between the same split thresholds of every tree share their scores. For
+synthetic BookingStrategyInfo inputs it scores every sweep both ways, then picks the three advices (best CP,
+month priority, lead-time priority) for the companion weights and a 0..1 risk-share slider. It reports
+whether the sweeps are identical, how often the same lead time is picked, the score regret of the picks that
+differ (normalized score under the exhaustive sweep) and how many rows each sweep sent to the models.
+
+Run from the repository root:
+    python -m scripts.evaluate_lead_time_search                      # stand-in models, exit 1 on any difference
+    python -m scripts.evaluate_lead_time_search --models configured  # the models from ml_logic.config
+"""
+import argparse
+import sys
+import time
+import numpy as np
+import pandas as pd
+from ml_logic.config import SWEEP_PROFILE_FEATURES
+from ml_logic.model_registry import model_registry
+from ml_logic.processors.sweep_store import SweepStore
+from scripts.benchmark_booking import build_stub_artifacts, make_inputs
+
+CATEGORIES = ['best_cp', 'month_priority', 'lt_priority']
+# Sweep table columns of the simulated arrival features
+SIMULATED_COLUMNS = {'arrival_date_month_num': 'month', 'arrival_date_week_number': 'week_number'}
+SLIDER_STEPS = 11
+
+def get_weight_pairs(booking_service, companion):
+    pairs = [booking_service.get_risk_price_weight(companion)]
+    pairs.extend((i / (SLIDER_STEPS - 1), 1 - i / (SLIDER_STEPS - 1)) for i in range(SLIDER_STEPS))
+    return pairs
+
+def score_sweeps(booking_service, feature_list, now, grid_lts, sweep_cells):
+    lts_list = [sorted(set(grid_lts) | ({int(features['lead_time'])} - {0})) for features in feature_list]
+    booking_service.sweep_cells = sweep_cells
+
+    started = time.perf_counter()
+    tables = booking_service._score_lead_time_batch(feature_list, now, lts_list)
+    elapsed = time.perf_counter() - started
+    profiles = np.repeat(np.arange(len(lts_list)), [len(lts) for lts in lts_list])
+    rows, _ = booking_service._get_sweep_cells(profiles, {
+        'lead_time': np.concatenate(lts_list),
+        **{col: np.concatenate([table[name].to_numpy() for table in tables]) for col, name in SIMULATED_COLUMNS.items()}
+    })
+
+    for table in tables:
+        table['on_grid'] = table['lt'].isin(grid_lts)
+    return tables, elapsed, len(rows)
+
+def get_score(res_df, lt, w_risk, w_price):
+    row = res_df[res_df['lt'] == lt].iloc[0]
+    return row['risk_norm'] * w_risk + row['price_norm'] * w_price
+
+def compare(booking_service, inputs, is_flexible_year, now):
+    payloads = [{**user_input, 'is_flexible_year': is_flexible_year} for user_input in inputs]
+    feature_list = [booking_service.build_booking_features(payload) for payload in payloads]
+    grid_lts = booking_service.get_test_lts(is_flexible_year=True)
+
+    sweep_cells = booking_service.sweep_cells
+    exhaustive, exhaustive_seconds, exhaustive_rows = score_sweeps(booking_service, feature_list, now, grid_lts, None)
+    searched, searched_seconds, searched_rows = score_sweeps(booking_service, feature_list, now, grid_lts, sweep_cells)
+    identical = all(full_table.equals(searched_table) for full_table, searched_table in zip(exhaustive, searched))
+
+    matches = {category: 0 for category in CATEGORIES}
+    regrets = []
+    picks = 0
+
+    for payload, features, full_table, searched_table in zip(payloads, feature_list, exhaustive, searched):
+        user_lt = int(features['lead_time'])
+        full_df = booking_service._select_sweep(full_table, user_lt, is_flexible_year)
+        searched_df = booking_service._select_sweep(searched_table, user_lt, is_flexible_year)
+        full_frontiers = booking_service._build_advice_frontiers(features, full_df)
+        searched_frontiers = booking_service._build_advice_frontiers(features, searched_df)
+
+        for w_risk, w_price in get_weight_pairs(booking_service, payload['companion']):
+            expected = booking_service._pick_advices(full_frontiers, w_risk, w_price, is_flexible_year)
+            found = booking_service._pick_advices(searched_frontiers, w_risk, w_price, is_flexible_year)
+            picks += 1
+
+            for category, expected_advice, found_advice in zip(CATEGORIES, expected, found):
+                if expected_advice is None or found_advice is None:
+                    matches[category] += expected_advice is None and found_advice is None
+                    continue
+                if expected_advice['lt'] == found_advice['lt']:
+                    matches[category] += 1
+                    continue
+                regret = get_score(full_df, found_advice['lt'], w_risk, w_price) - get_score(full_df, expected_advice['lt'], w_risk, w_price)
+                regrets.append(max(float(regret), 0.0))
+
+    return {
+        'profiles': len(inputs),
+        'picks': picks,
+        'identical': identical,
+        'exhaustive_rows': exhaustive_rows / len(inputs),
+        'searched_rows': searched_rows / len(inputs),
+        'exhaustive_ms': exhaustive_seconds / len(inputs) * 1000,
+        'searched_ms': searched_seconds / len(inputs) * 1000,
+        'agreement': {category: matches[category] / picks for category in CATEGORIES},
+        'regrets': regrets
+    }
+
+def print_report(mode, report):
+    print(f"\n{mode} ({report['profiles']} profiles x {report['picks'] // report['profiles']} weight pairs)")
+    print(f"  rows scored per sweep: exhaustive {report['exhaustive_rows']:.1f}, tree cells {report['searched_rows']:.1f} "
+          f"({report['searched_rows'] / report['exhaustive_rows']:.0%})")
+    print(f"  sweep ms per profile (batched): exhaustive {report['exhaustive_ms']:.3f}, tree cells {report['searched_ms']:.3f}")
+    print(f"  sweeps identical: {report['identical']}")
+    print("  same lead time picked: " + ", ".join(f"{category} {share:.1%}" for category, share in report['agreement'].items()))
+    if report['regrets']:
+        print(f"  differing picks: {len(report['regrets'])}, score regret mean {np.mean(report['regrets']):.4f} max {np.max(report['regrets']):.4f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", choices=["stub", "configured"], default="stub", help="stand-in models or the ones from ml_logic.config")
+    parser.add_argument("--inputs", type=int, default=60, help="synthetic requests per mode")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-agreement", type=float, default=1.0, help="fail when any category agrees less often")
+    args = parser.parse_args()
+
+    if args.models == "stub":
+        for name, artifact in build_stub_artifacts(args.seed).items():
+            model_registry.register(name, lambda artifact=artifact: artifact)
+
+    booking_service = model_registry.get('booking_service')
+    if booking_service.sweep_cells is None:
+        print("❌ The booking models have no sweep cells (see the start-up warnings)")
+        return 1
+    booking_service.use_dispatcher = False
+    booking_service.sweep_store = SweepStore(None, SWEEP_PROFILE_FEATURES)
+
+    now = pd.Timestamp.now().normalize()
+    inputs = make_inputs(args.inputs, args.seed)
+    worst = 1.0
+    identical = True
+
+    for is_flexible_year in (False, True):
+        report = compare(booking_service, inputs, is_flexible_year, now)
+        print_report(f"flexible_year={is_flexible_year}", report)
+        worst = min(worst, *report['agreement'].values())
+        identical &= report['identical']
+
+    if not identical:
+        print("\n❌ Sweeps scored per tree cell differ from the exhaustive ones")
+        return 1
+    if worst < args.min_agreement:
+        print(f"\n❌ Agreement {worst:.1%} is below {args.min_agreement:.0%}")
+        return 1
+    print(f"\n✅ Lowest agreement {worst:.1%}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+"""
+Nightly job: precompute the lead-time sweeps of the most requested booking profiles.
+
+Run from the repository root after midnight (the file is only used on the day it is computed for):
+    BOOKING_PROFILE_LOG_PATH=/var/log/travel-planner/booking_profiles.jsonl python -m scripts.precompute_booking_sweeps --top 1000
+"""
+import argparse
+import time
+from collections import Counter
+import pandas as pd
+from ml_logic.config import BOOKING_PROFILE_LOG_PATH, SWEEP_STORE_PATH, SWEEP_STORE_MAX_LT, SWEEP_PROFILE_FEATURES
+from ml_logic.model_registry import model_registry
+from ml_logic.processors.sweep_store import read_profile_log, write_sweep_store
+
+# Profiles scored per model call (each one expands to max_lt rows)
+CHUNK_SIZE = 64
+
+def get_top_profiles(log_path, top_n):
+    counts = Counter(read_profile_log(log_path, SWEEP_PROFILE_FEATURES))
+    return [key for key, _ in counts.most_common(top_n)]
+
+def to_sweep_features(key):
+    # Lead time, month and week are overwritten by the sweep
+    features = dict(zip(SWEEP_PROFILE_FEATURES, key))
+    features.update({'lead_time': 0, 'arrival_date_month_num': 1, 'arrival_date_week_number': 1})
+    return features
+
+def precompute(log_path, out_path, top_n, max_lt):
+    started = time.perf_counter()
+    keys = get_top_profiles(log_path, top_n)
+    print(f"Found {len(keys)} profiles to precompute in {log_path}")
+
+    booking_service = model_registry.get('booking_service')
+    now = pd.Timestamp.now().normalize()
+    risks, prices = [], []
+
+    for start in range(0, len(keys), CHUNK_SIZE):
+        chunk = [to_sweep_features(key) for key in keys[start:start + CHUNK_SIZE]]
+        chunk_risks, chunk_prices = booking_service.precompute_sweeps(chunk, now, max_lt)
+        risks.extend(chunk_risks)
+        prices.extend(chunk_prices)
+
+    write_sweep_store(out_path, now.date(), SWEEP_PROFILE_FEATURES, keys, risks, prices)
+    print(f"✅ Wrote {len(keys)} sweeps for {now.date()} to {out_path} in {time.perf_counter() - started:.1f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--log", default=BOOKING_PROFILE_LOG_PATH, help="booking profile log (JSON lines)")
+    parser.add_argument("--out", default=SWEEP_STORE_PATH, help="sweep store file to write")
+    parser.add_argument("--top", type=int, default=1000, help="number of most requested profiles to precompute")
+    parser.add_argument("--max-lt", type=int, default=SWEEP_STORE_MAX_LT, help="largest lead time to precompute")
+    args = parser.parse_args()
+
+    if not args.log:
+        parser.error("no profile log: pass --log or set BOOKING_PROFILE_LOG_PATH")
+
+    precompute(args.log, args.out, args.top, args.max_lt)
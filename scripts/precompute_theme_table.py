@@ -0,0 +1,37 @@
+"""
+Offline job: precompute the theme prediction of every profile the theme model knows (ml_logic.processors.theme_table).
+
+Every age in --min-age..--max-age is crossed with every gender, nationality and travel-companion label of
+the model's one-hot encoders and the three budget levels. Ages with identical predictions share a bucket.
+Run from the repository root whenever the theme model changes (a stale table is rejected on load), then
+publish the file next to theme_rf_model.pkl on the Hugging Face dataset (THEME_TABLE_PATH in production):
+    python -m scripts.precompute_theme_table
+"""
+import argparse
+import os
+import time
+from ml_logic.config import MODELS_DIR
+from ml_logic.model_registry import model_registry
+from ml_logic.processors.theme_table import build_theme_table, get_model_categories
+
+def precompute(out_path, min_age, max_age):
+    started = time.perf_counter()
+    theme_city_service = model_registry.get('theme_city_service')
+    categories = get_model_categories(theme_city_service.preprocessor)
+
+    table = build_theme_table(theme_city_service.predict_theme_indices, categories, min_age, max_age)
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    table.save(out_path)
+
+    rows = len(table.age_buckets) * table.table[0].size
+    print(f"✅ Wrote theme table of {rows} profiles ({table.table.shape[0]} age buckets, "
+          f"{table.table.nbytes} bytes) to {out_path} in {time.perf_counter() - started:.1f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default=os.path.join(MODELS_DIR, "theme_predict", "theme_table.npz"), help="theme table file to write")
+    parser.add_argument("--min-age", type=int, default=0)
+    parser.add_argument("--max-age", type=int, default=120)
+    args = parser.parse_args()
+
+    precompute(args.out, args.min_age, args.max_age)